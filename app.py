@@ -1,13 +1,143 @@
-from functools import lru_cache
+import os
+import json
+import getpass
+import time
+import tempfile
+import threading
+from concurrent.futures import wait
 
-from flask import Flask, render_template, request
+from flask import (
+    Flask,
+    Response,
+    render_template,
+    request,
+    jsonify,
+    abort,
+    url_for,
+)
 
+from ml_editor.batching import RequestCoalescer
+from ml_editor.jobs import BackgroundJobs, JobQueueFull
 from ml_editor.prototype import get_recommendations_from_input
+from ml_editor.result_cache import FileResultCache, get_cache_key
+import ml_editor.model_v1 as v1_model
 import ml_editor.model_v2 as v2_model
 import ml_editor.model_v3 as v3_model
 
 app = Flask(__name__)
 
+# Results are cached on disk so that every worker process shares them. The
+# location, size and lifetime of the cache can be set from the environment.
+# The directory must only be accessible to the user running the app, by
+# default it is private to that user in the temp directory
+RESULT_CACHE = FileResultCache(
+    os.environ.get(
+        "ML_EDITOR_CACHE_DIR",
+        os.path.join(
+            tempfile.gettempdir(),
+            "ml_editor_cache-{}".format(getpass.getuser()),
+        ),
+    ),
+    max_bytes=int(os.environ.get("ML_EDITOR_CACHE_BYTES", 256 * 1024 * 1024)),
+    ttl=float(os.environ.get("ML_EDITOR_CACHE_TTL", 24 * 60 * 60)),
+)
+# Cached results are dropped when the artifacts of their model change
+MODEL_ARTIFACTS = {
+    "v1": [],
+    "v2": v2_model.ARTIFACT_PATHS,
+    "v3": v3_model.ARTIFACT_PATHS,
+}
+
+# Models load their resources on first use. Models listed in the
+# ML_EDITOR_WARM_UP environment variable (e.g. "v2,v3") are loaded at startup
+WARM_UP_FUNCTIONS = {
+    "v1": v1_model.warm_up,
+    "v2": v2_model.warm_up,
+    "v3": v3_model.warm_up,
+}
+
+
+def warm_up_models(model_names):
+    """
+    Load the resources of models ahead of their first request
+    
+    Parameters
+    ----------
+    model_names : list of String
+        Names of the models to load, e.g. ["v2", "v3"]
+    """
+    for model_name in model_names:
+        WARM_UP_FUNCTIONS[model_name]()
+
+
+WARM_UP_MODELS = os.environ.get("ML_EDITOR_WARM_UP", "")
+warm_up_models([name for name in WARM_UP_MODELS.split(",") if name])
+
+# Largest number of questions accepted by a batch endpoint
+MAX_BATCH_SIZE = 1000
+
+# Concurrent single question requests to the v2 and v3 models are scored
+# together, by batches of up to COALESCED_BATCH_SIZE questions gathered over
+# at most COALESCING_WINDOW seconds
+COALESCED_BATCH_SIZE = 32
+COALESCING_WINDOW = 0.005
+COALESCERS = {
+    "v2": RequestCoalescer(
+        v2_model.get_pos_scores_from_texts,
+        max_batch_size=COALESCED_BATCH_SIZE,
+        max_wait=COALESCING_WINDOW,
+    ),
+}
+# v3 questions are scored the same way, keeping their features so that they
+# can be explained afterwards
+V3_SCORER = RequestCoalescer(
+    v3_model.get_scores_and_features_from_texts,
+    max_batch_size=COALESCED_BATCH_SIZE,
+    max_wait=COALESCING_WINDOW,
+)
+# Explanations take far longer than scores, so they run on their own bounded
+# pool of threads and scores never wait behind them. Once
+# ML_EDITOR_EXPLANATION_QUEUE explanations are pending, new ones are refused
+# until the queue drains. Explanations running together have their
+# perturbations scored in one call, see v3_model.PERTURBATION_SCORER
+EXPLANATION_JOBS = BackgroundJobs(
+    max_workers=int(os.environ.get("ML_EDITOR_EXPLANATION_WORKERS", 4)),
+    max_pending=int(os.environ.get("ML_EDITOR_EXPLANATION_QUEUE", 32)),
+    ttl=float(os.environ.get("ML_EDITOR_EXPLANATION_TTL", 300)),
+)
+# Seconds clients are asked to wait before retrying when the queue is full
+EXPLANATION_RETRY_AFTER = 5
+# Jobs only live in the worker which submitted them. Their state is also
+# written to RESULT_CACHE so that any worker can report it, and pending
+# jobs whose worker did not finish them within EXPLANATION_TIMEOUT seconds
+# are reported as unknown
+JOB_STATE_NAMESPACE = RESULT_CACHE.get_namespace("v3_jobs")
+EXPLANATION_TIMEOUT = float(
+    os.environ.get("ML_EDITOR_EXPLANATION_TIMEOUT", 600)
+)
+# Each open stream holds a server thread, so a worker serves at most
+# ML_EDITOR_MAX_STREAMS of them and asks other clients to poll instead.
+# gunicorn.conf.py adds as many threads to the ones serving scores
+MAX_STREAMS = int(os.environ.get("ML_EDITOR_MAX_STREAMS", 2))
+STREAM_SLOTS = threading.BoundedSemaphore(MAX_STREAMS)
+# Seconds between keep-alive comments of explanation streams. Writing them
+# is how a stream notices that its client disconnected
+STREAM_HEARTBEAT = 1.0
+# Seconds after which a stream stops, telling its client to poll instead
+STREAM_TIMEOUT = 60
+EXPLANATION_STATUS_CODES = {
+    "done": 200,
+    "pending": 202,
+    "unknown": 404,
+    "cancelled": 410,
+    "failed": 500,
+}
+PENDING_RECOMMENDATIONS = "Generating recommendations..."
+BUSY_RECOMMENDATIONS = (
+    "Too many questions are being explained, please try again in a few "
+    "seconds."
+)
+
 
 @app.route("/")
 def landing_page():
@@ -41,6 +171,135 @@ def v3():
     return handle_text_request(request, "v3.html")
 
 
+@app.route("/v1/batch", methods=["POST"])
+def v1_batch():
+    """
+    Scores a JSON batch of questions with the v1 model
+    """
+    return handle_batch_request(request, "v1")
+
+
+@app.route("/v2/batch", methods=["POST"])
+def v2_batch():
+    """
+    Scores a JSON batch of questions with the v2 model
+    """
+    return handle_batch_request(request, "v2")
+
+
+@app.route("/v3/batch", methods=["POST"])
+def v3_batch():
+    """
+    Scores a JSON batch of questions with the v3 model
+    """
+    return handle_batch_request(request, "v3")
+
+
+@app.route("/v3/explanations/<explanation>/<key>", methods=["GET", "DELETE"])
+def explanation_status(explanation, key):
+    """
+    Returns the status of the explanation of a v3 question as JSON, along
+    with its recommendations once done. DELETE releases the subscription
+    of the client which submitted the question, cancelling the explanation
+    if it has not started and no other client waits for it
+    """
+    check_explanation_mode(explanation, error_code=404)
+    if request.method == "DELETE":
+        cancelled = release_explanation(explanation, key)
+        return jsonify(cancelled=cancelled)
+    status, recommendations = get_explanation_status(explanation, key)
+    return (
+        jsonify(status=status, recommendations=recommendations),
+        EXPLANATION_STATUS_CODES[status],
+    )
+
+
+@app.route("/v3/explanations/<explanation>/<key>/stream")
+def stream_explanation(explanation, key):
+    """
+    Streams the explanation of a v3 question as a server-sent event once it
+    is done. A stream stands for the client which submitted the question:
+    if it disconnects before the explanation is done, its subscription is
+    released like with a DELETE request. When MAX_STREAMS streams are
+    already open, or after STREAM_TIMEOUT seconds, clients are asked to
+    poll explanation_status instead.
+    """
+    check_explanation_mode(explanation, error_code=404)
+    if not STREAM_SLOTS.acquire(blocking=False):
+        return (
+            jsonify(error="Too many open streams, poll the status instead"),
+            503,
+            {"Retry-After": str(EXPLANATION_RETRY_AFTER)},
+        )
+    job_id = (explanation, key)
+
+    def generate():
+        future = EXPLANATION_JOBS.get(job_id)
+        deadline = time.monotonic() + STREAM_TIMEOUT
+        status, recommendations = "pending", None
+        try:
+            while time.monotonic() < deadline:
+                status, recommendations = get_explanation_status(
+                    explanation, key
+                )
+                if status != "pending":
+                    break
+                yield ": pending\n\n"
+                if future is not None:
+                    wait([future], timeout=STREAM_HEARTBEAT)
+                else:
+                    # Submitted by another worker, its result will appear
+                    # in the shared cache
+                    time.sleep(STREAM_HEARTBEAT)
+            yield "event: {}\ndata: {}\n\n".format(
+                status, json.dumps(recommendations)
+            )
+        except GeneratorExit:
+            # The client disconnected at a pending yield
+            if future is not None:
+                release_explanation(explanation, key)
+            raise
+
+    response = Response(
+        generate(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+    # Runs even if the client leaves before the stream starts
+    response.call_on_close(STREAM_SLOTS.release)
+    return response
+
+
+@app.route("/cache/stats")
+def cache_stats():
+    """
+    Returns the hit and miss counters of the result cache, summed over
+    every worker sharing it
+    """
+    return jsonify(RESULT_CACHE.stats())
+
+
+def check_explanation_mode(explanation, error_code=400):
+    """
+    Abort requests for unknown or unavailable explanation modes
+    
+    Parameters
+    ----------
+    explanation : String
+        Explanation mode picked by the request, if any
+    error_code : int, optional
+        HTTP status of the error, by default 400
+
+    Returns
+    -------
+        Name of the explanation mode to use
+    """
+    try:
+        return v3_model.get_explanation_mode(explanation)
+    except ValueError as e:
+        abort(error_code, str(e))
+
+
 def get_model_from_template(template_name):
     """
     Get the name of the relevant model from the name of the template
@@ -56,12 +315,11 @@ def get_model_from_template(template_name):
     return template_name.split(".")[0]
 
 
-@lru_cache(maxsize=128)
-def retrieve_recommendations_for_model(question, model):
+def retrieve_recommendations_for_model(question, model, explanation=None):
     """
     This function computes or retrieves recommendations
-    We use an LRU cache to store results we process. If we see
-    the same question twice, we can retrieve cached results to serve
+    We use a cache shared by all workers to store results we process. If we
+    see the same question twice, we can retrieve cached results to serve
     them faster
     
     Parameters
@@ -70,6 +328,67 @@ def retrieve_recommendations_for_model(question, model):
         The input text to the model
     model : String
         Which model to use
+    explanation : String, optional
+        Explanation mode of the v3 model, by default
+        v3_model.DEFAULT_EXPLANATION_MODE
+
+    Returns
+    -------
+        a models' recommendations
+    """
+    namespace = get_cache_namespace(model, explanation=explanation)
+    recommendations = RESULT_CACHE.get(namespace, question)
+    if recommendations is None:
+        recommendations = compute_recommendations_for_model(
+            question, model, explanation=explanation
+        )
+        RESULT_CACHE.set(namespace, question, recommendations)
+    return recommendations
+
+
+def get_cache_namespace(model, explanation=None):
+    """
+    Namespace of the result cache holding a model's recommendations. v3
+    recommendations are cached separately for each explanation mode
+    
+    Parameters
+    ----------
+    model : String
+        Which model to use
+    explanation : String, optional
+        Explanation mode of the v3 model, by default
+        v3_model.DEFAULT_EXPLANATION_MODE
+
+    Returns
+    -------
+        Namespace to pass to RESULT_CACHE
+    """
+    if model not in MODEL_ARTIFACTS:
+        raise ValueError("Incorrect Model passed")
+    cache_name = model
+    artifact_paths = MODEL_ARTIFACTS[model]
+    if model == "v3":
+        explanation = v3_model.get_explanation_mode(explanation)
+        cache_name = "{}_{}".format(model, explanation)
+        if explanation == v3_model.SURROGATE_MODE:
+            artifact_paths = v3_model.SURROGATE_ARTIFACT_PATHS
+    return RESULT_CACHE.get_namespace(cache_name, artifact_paths)
+
+
+def compute_recommendations_for_model(question, model, explanation=None):
+    """
+    This function computes recommendations. Questions for the v2 and v3
+    models are scored in batches with other concurrent requests
+    
+    Parameters
+    ----------
+    question : String
+        The input text to the model
+    model : String
+        Which model to use
+    explanation : String, optional
+        Explanation mode of the v3 model, by default
+        v3_model.DEFAULT_EXPLANATION_MODE
 
     Returns
     -------
@@ -77,17 +396,206 @@ def retrieve_recommendations_for_model(question, model):
     """
     if model == "v1":
         return get_recommendations_from_input(question)
-    if model == "v2":
-        return v2_model.get_pos_score_from_text(question)
     if model == "v3":
-        return v3_model.get_recommendation_and_prediction_from_text(question)
+        pos_score, feats = V3_SCORER(question)
+        recs = v3_model.get_recommendations_from_features(
+            feats, mode=explanation
+        )
+        return v3_model.format_recommendation_and_prediction(pos_score, recs)
+    if model in COALESCERS:
+        return COALESCERS[model](question)
     raise ValueError("Incorrect Model passed")
 
 
+def run_explanation_job(question, pos_score, feats, explanation, namespace):
+    """
+    Explains a scored v3 question and caches its recommendations, so that
+    they can be served by any worker
+    
+    Parameters
+    ----------
+    question : String
+        The input text to the model
+    pos_score : float
+        Probability of the question receiving a high score
+    feats : array-like
+        Features of the question
+    explanation : String
+        Explanation mode of the v3 model
+    namespace : String
+        Namespace returned by get_cache_namespace
+
+    Returns
+    -------
+        The question's score along with recommendations
+    """
+    try:
+        recs = v3_model.get_recommendations_from_features(
+            feats, mode=explanation
+        )
+    except Exception:
+        set_job_state(explanation, get_cache_key(question), "failed")
+        raise
+    recommendations = v3_model.format_recommendation_and_prediction(
+        pos_score, recs
+    )
+    RESULT_CACHE.set(namespace, question, recommendations)
+    return recommendations
+
+
+def set_job_state(explanation, key, status):
+    """
+    Record the state of an explanation where every worker can read it
+    
+    Parameters
+    ----------
+    explanation : String
+        Explanation mode of the v3 model
+    key : String
+        Cache key of the question
+    status : String
+        "pending", "cancelled", "failed", or "unknown" when the
+        explanation could not be submitted
+    """
+    RESULT_CACHE.set(
+        JOB_STATE_NAMESPACE,
+        "{}:{}".format(explanation, key),
+        {"status": status, "updated": time.time()},
+    )
+
+
+def release_explanation(explanation, key):
+    """
+    Release the subscription of a client to the explanation of a question,
+    cancelling it if it has not started and no other client waits for it.
+    Only explanations submitted to this worker can be cancelled.
+    
+    Parameters
+    ----------
+    explanation : String
+        Explanation mode of the v3 model
+    key : String
+        Cache key of the question
+
+    Returns
+    -------
+        True if the explanation was cancelled
+    """
+    cancelled = EXPLANATION_JOBS.release((explanation, key))
+    if cancelled:
+        set_job_state(explanation, key, "cancelled")
+    return cancelled
+
+
+def get_explanation_status(explanation, key):
+    """
+    Looks up the explanation of a v3 question in the jobs of this worker,
+    then in the result cache and the job states, as it may have been
+    submitted to another worker
+    
+    Parameters
+    ----------
+    explanation : String
+        Explanation mode of the v3 model
+    key : String
+        Cache key of the question
+
+    Returns
+    -------
+        A key of EXPLANATION_STATUS_CODES, and recommendations once done
+    """
+    future = EXPLANATION_JOBS.get((explanation, key))
+    if future is not None:
+        if future.cancelled():
+            return "cancelled", None
+        if not future.done():
+            return "pending", None
+        if future.exception() is not None:
+            return "failed", None
+        return "done", future.result()
+
+    namespace = get_cache_namespace("v3", explanation=explanation)
+    recommendations = RESULT_CACHE.get_by_key(namespace, key, count=False)
+    if recommendations is not None:
+        return "done", recommendations
+    state = RESULT_CACHE.get(
+        JOB_STATE_NAMESPACE, "{}:{}".format(explanation, key), count=False
+    )
+    if state is None:
+        return "unknown", None
+    is_stale = time.time() - state["updated"] > EXPLANATION_TIMEOUT
+    if state["status"] == "pending" and is_stale:
+        return "unknown", None
+    return state["status"], None
+
+
+def get_batch_scores_for_model(questions, model):
+    """
+    Scores a batch of questions with a single vectorization and prediction
+    call, returning the probability of each question receiving a high score
+    
+    Parameters
+    ----------
+    questions : list of String
+        The input texts to the model
+    model : String
+        Which model to use
+
+    Returns
+    -------
+        list of probabilities, in the same order as the questions
+    """
+    if model == "v1":
+        probs = v1_model.get_model_probabilities_for_input_texts(questions)
+    elif model == "v2":
+        probs = v2_model.get_model_probabilities_for_input_texts(questions)
+    elif model == "v3":
+        probs = v3_model.get_model_probabilities_for_input_texts(questions)
+    else:
+        raise ValueError("Incorrect Model passed")
+    return [float(prob) for prob in probs[:, 1]]
+
+
+def handle_batch_request(request, model_name):
+    """
+    Scores the questions of a JSON request of the form
+    {"questions": ["first question", ...]}
+    
+    Parameters
+    ----------
+    request : HTTP request
+        http request
+    model_name : String
+        Which model to use
+
+    Returns
+    -------
+        JSON response with one score per question, or an error message
+    """
+    payload = request.get_json(silent=True) or {}
+    questions = payload.get("questions")
+    if not isinstance(questions, list) or not all(
+        isinstance(question, str) for question in questions
+    ):
+        return jsonify(error="Expected a list of strings in 'questions'"), 400
+    if len(questions) > MAX_BATCH_SIZE:
+        return (
+            jsonify(
+                error="At most {} questions per batch".format(MAX_BATCH_SIZE)
+            ),
+            413,
+        )
+    scores = []
+    if questions:
+        scores = get_batch_scores_for_model(questions, model_name)
+    return jsonify(model_name=model_name, scores=scores)
+
+
 def handle_text_request(request, template_name):
     """
     Renders an input form for GET requests and display results for the given
-    posted question for a POST request
+    posted question for a POST request. v3 requests can pick how questions
+    are explained with an explanation field, e.g. "full" for full LIME
     
     Parameters
     ----------
@@ -103,7 +611,13 @@ def handle_text_request(request, template_name):
     if request.method == 'POST':
         question = request.form.get("question")
         model_name = get_model_from_template(template_name)
-        suggestions = retrieve_recommendations_for_model(question, model_name)
+        explanation = request.values.get("explanation")
+        if model_name == "v3":
+            explanation = check_explanation_mode(explanation)
+            return handle_v3_request(question, explanation=explanation)
+        suggestions = retrieve_recommendations_for_model(
+            question, model_name, explanation=explanation
+        )
         payload = {
             "input": question,
             "suggestions": suggestions,
@@ -111,4 +625,75 @@ def handle_text_request(request, template_name):
         }
         return render_template("results.html", ml_result=payload)
     else:
-        return render_template(template_name)
\ No newline at end of file
+        return render_template(template_name)
+
+
+def handle_v3_request(question, explanation=None):
+    """
+    Displays the v3 score of a question right away, and explains it in the
+    background unless its recommendations are cached or come from the
+    surrogate table, which is fast enough to look up inline. The results
+    page then receives them from stream_explanation, or polls
+    explanation_status when no stream is available
+    
+    Parameters
+    ----------
+    question : String
+        The input text to the model
+    explanation : String, optional
+        Explanation mode of the v3 model, by default
+        v3_model.DEFAULT_EXPLANATION_MODE
+
+    Returns
+    -------
+        Render results, with a 503 status if too many explanations are
+        pending
+    """
+    explanation = v3_model.get_explanation_mode(explanation)
+    namespace = get_cache_namespace("v3", explanation=explanation)
+    payload = {"input": question, "model_name": "v3"}
+    recommendations = RESULT_CACHE.get(namespace, question)
+    if recommendations is not None:
+        payload["suggestions"] = recommendations
+        return render_template("results.html", ml_result=payload)
+    if explanation == v3_model.SURROGATE_MODE:
+        payload["suggestions"] = retrieve_recommendations_for_model(
+            question, "v3", explanation=explanation
+        )
+        return render_template("results.html", ml_result=payload)
+
+    pos_score, feats = V3_SCORER(question)
+    key = get_cache_key(question)
+    # Recorded before submitting, as a job failing right away records its
+    # own state, which must not be overwritten
+    set_job_state(explanation, key, "pending")
+    try:
+        EXPLANATION_JOBS.submit(
+            (explanation, key),
+            run_explanation_job,
+            question,
+            pos_score,
+            feats,
+            explanation,
+            namespace,
+        )
+    except JobQueueFull:
+        set_job_state(explanation, key, "unknown")
+        payload["suggestions"] = v3_model.format_recommendation_and_prediction(
+            pos_score, BUSY_RECOMMENDATIONS
+        )
+        return (
+            render_template("results.html", ml_result=payload),
+            503,
+            {"Retry-After": str(EXPLANATION_RETRY_AFTER)},
+        )
+    payload["suggestions"] = v3_model.format_recommendation_and_prediction(
+        pos_score, PENDING_RECOMMENDATIONS
+    )
+    payload["stream_url"] = url_for(
+        "stream_explanation", explanation=explanation, key=key
+    )
+    payload["status_url"] = url_for(
+        "explanation_status", explanation=explanation, key=key
+    )
+    return render_template("results.html", ml_result=payload)
@@ -0,0 +1,47 @@
+"""
+Report the median time taken to explain questions with the v3 model, for
+each explanation mode of model_v3. Features are generated beforehand, only
+explanations are timed. Needs the v3 model and the explainer training data.
+
+Usage: python benchmarks/explanation_latency.py [num_questions]
+    [path/to/Posts.xml]
+"""
+import os
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+myPath = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, myPath + '/../')
+
+from ml_editor.data_ingestion import parse_xml_to_csv
+from ml_editor.explanation_generation import EXPLAINER, explain_features
+from ml_editor.model_v3 import (
+    EXPLANATION_MODES,
+    MODEL,
+    get_features_from_text_array,
+)
+
+DEFAULT_PATH = Path(myPath) / "../tests/fixtures/MiniPosts.xml"
+
+
+if __name__ == '__main__':
+    num_questions = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    path = sys.argv[2] if len(sys.argv) > 2 else DEFAULT_PATH
+
+    posts = parse_xml_to_csv(path)
+    texts = posts["Title"].fillna("").str.cat(posts["body_text"], sep=" ")
+    features = get_features_from_text_array(texts.values[:num_questions])
+    model = MODEL.get()
+    EXPLAINER.get()
+
+    print("questions: {}".format(len(features)))
+    for mode, settings in EXPLANATION_MODES.items():
+        timings = []
+        for feats in features.values:
+            start = time.perf_counter()
+            explain_features(feats, model.predict_proba, **settings)
+            timings.append(time.perf_counter() - start)
+        print("{:<10} p50 {:.3f}s".format(mode, np.median(timings)))
@@ -0,0 +1,52 @@
+"""
+Compare the fast html decoder to BeautifulSoup on the bodies of a posts dump.
+
+Usage: python benchmarks/html_decoding.py [path/to/Posts.xml] [repeats]
+"""
+import os
+import sys
+import time
+from pathlib import Path
+
+from bs4 import BeautifulSoup
+
+myPath = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, myPath + '/../')
+
+from ml_editor.data_ingestion import (
+    iter_xml_rows,
+    get_text_from_html,
+    get_text_from_simple_html,
+)
+
+DEFAULT_PATH = Path(myPath) / "../tests/fixtures/MiniPosts.xml"
+
+
+def time_decoder(decoder, bodies):
+    start = time.perf_counter()
+    for body in bodies:
+        decoder(body)
+    return time.perf_counter() - start
+
+
+def decode_with_soup(body):
+    return BeautifulSoup(body, features='html.parser').get_text()
+
+
+if __name__ == '__main__':
+    path = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_PATH
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+
+    bodies = [row['Body'] for row in iter_xml_rows(path)] * repeats
+    num_simple = sum(
+        get_text_from_simple_html(body) is not None for body in bodies
+    )
+
+    soup_time = time_decoder(decode_with_soup, bodies)
+    fast_time = time_decoder(get_text_from_html, bodies)
+    print("bodies: {}, handled by fast path: {:.1%}".format(
+        len(bodies), num_simple / len(bodies)
+    ))
+    print("BeautifulSoup: {:.3f}s".format(soup_time))
+    print("fast decoder:  {:.3f}s".format(fast_time))
+    print("speedup:       {:.1f}x".format(soup_time / fast_time))
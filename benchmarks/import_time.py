@@ -0,0 +1,70 @@
+"""
+Measure how long a fresh interpreter takes to import each model module and
+the Flask app, and how long each model takes to warm up.
+
+Usage: python benchmarks/import_time.py [repeats]
+"""
+import os
+import sys
+import subprocess
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+MODULES = [
+    "ml_editor.model_v1",
+    "ml_editor.model_v2",
+    "ml_editor.model_v3",
+    "app",
+]
+
+TIMING_SCRIPT = """
+import time
+start = time.perf_counter()
+import {module} as module
+elapsed = time.perf_counter() - start
+if {warm_up} and hasattr(module, "warm_up"):
+    start = time.perf_counter()
+    module.warm_up()
+    elapsed = time.perf_counter() - start
+print(elapsed)
+"""
+
+
+def time_in_fresh_interpreter(module, warm_up=False):
+    """
+    Run the timing script in a new process, so nothing is already imported
+    """
+    script = TIMING_SCRIPT.format(module=module, warm_up=warm_up)
+    output = subprocess.run(
+        [sys.executable, "-c", script],
+        cwd=ROOT,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+    )
+    if output.returncode != 0:
+        return None
+    return float(output.stdout.strip().splitlines()[-1])
+
+
+def format_time(seconds):
+    return "failed" if seconds is None else "{:.3f}s".format(seconds)
+
+
+if __name__ == '__main__':
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+
+    print("{:<22}{:>10}{:>10}".format("module", "import", "warm up"))
+    for module in MODULES:
+        import_times = [
+            time_in_fresh_interpreter(module) for _ in range(repeats)
+        ]
+        import_time = None if None in import_times else min(import_times)
+        warm_up_time = None
+        if module != "app":
+            warm_up_time = time_in_fresh_interpreter(module, warm_up=True)
+        print("{:<22}{:>10}{:>10}".format(
+            module,
+            format_time(import_time),
+            "-" if module == "app" else format_time(warm_up_time),
+        ))
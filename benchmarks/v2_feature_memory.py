@@ -0,0 +1,119 @@
+"""
+Report the peak memory (max RSS) of generating the v2 character and word
+features, with the previous pipeline which stored a column of spaCy docs and
+copied the DataFrame at every step, and with the current streaming pipeline.
+Each pipeline runs in a fresh process so peaks do not overlap.
+
+Usage: python benchmarks/v2_feature_memory.py [num_questions]
+    [path/to/Posts.xml] [spacy_model_name_or_path]
+"""
+import os
+import sys
+import resource
+import multiprocessing
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+myPath = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, myPath + '/../')
+
+import ml_editor.model_v2 as model_v2
+from ml_editor.data_ingestion import parse_xml_to_csv
+from ml_editor.resources import LazyResource
+
+DEFAULT_PATH = Path(myPath) / "../tests/fixtures/MiniPosts.xml"
+
+
+def legacy_word_stats(df):
+    """
+    Previous implementation of get_word_stats, keeping every doc
+    """
+    spacy_model = model_v2.SPACY_MODEL.get()
+    df['spacy_text'] = df['full_text'].apply(lambda x: spacy_model(x))
+    features = model_v2.get_doc_features(df['spacy_text'], df['num_chars'])
+    for i, feature_name in enumerate(model_v2.DOC_FEATURE_NAMES):
+        df[feature_name] = features[:, i]
+    return df
+
+
+def legacy_features(df):
+    df = model_v2.add_char_count_features(df.copy())
+    df = legacy_word_stats(df.copy())
+    # Sentiment scores were computed on a copy as well
+    return df.copy()
+
+
+def streaming_features(df):
+    df = model_v2.add_char_count_features(df)
+    return model_v2.get_word_stats(df)
+
+
+def get_peak_memory():
+    """
+    Peak resident memory of the current process in MB
+    """
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def measure(pipeline, num_questions, path, spacy_model_name, results):
+    if spacy_model_name:
+        import spacy
+
+        model_v2.SPACY_MODEL = LazyResource(
+            lambda: spacy.load(
+                spacy_model_name, disable=model_v2.UNUSED_SPACY_PIPES
+            )
+        )
+    posts = parse_xml_to_csv(path)
+    texts = posts["Title"].fillna("").str.cat(posts["body_text"], sep=" ")
+    df = pd.DataFrame({"full_text": np.resize(texts.values, num_questions)})
+    model_v2.SPACY_MODEL.get()
+
+    baseline = get_peak_memory()
+    features = pipeline(df)
+    results.put(
+        (
+            get_peak_memory(),
+            baseline,
+            features[model_v2.DOC_FEATURE_NAMES].values,
+        )
+    )
+
+
+def run(pipeline, num_questions, path, spacy_model_name):
+    ctx = multiprocessing.get_context("spawn")
+    results = ctx.Queue()
+    process = ctx.Process(
+        target=measure,
+        args=(pipeline, num_questions, path, spacy_model_name, results),
+    )
+    process.start()
+    result = results.get()
+    process.join()
+    return result
+
+
+if __name__ == '__main__':
+    num_questions = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    path = sys.argv[2] if len(sys.argv) > 2 else DEFAULT_PATH
+    spacy_model_name = sys.argv[3] if len(sys.argv) > 3 else None
+
+    print("questions: {}".format(num_questions))
+    outputs = []
+    for name, pipeline in [
+        ("doc column and copies", legacy_features),
+        ("streaming", streaming_features),
+    ]:
+        peak, baseline, features = run(
+            pipeline, num_questions, path, spacy_model_name
+        )
+        outputs.append(features)
+        print(
+            "{:<22} peak RSS {:.0f}MB ({:+.0f}MB over loaded model)".format(
+                name, peak, peak - baseline
+            )
+        )
+
+    assert np.allclose(outputs[0], outputs[1], equal_nan=True)
@@ -0,0 +1,92 @@
+"""
+Compare the single pass spaCy feature extractor of model_v2 to the previous
+implementation, which walked each doc once per feature and once per part of
+speech. Docs are parsed once beforehand, only feature extraction is timed.
+
+Usage: python benchmarks/word_stats.py [num_questions] [path/to/Posts.xml]
+"""
+import os
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+myPath = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, myPath + '/../')
+
+from ml_editor.data_ingestion import parse_xml_to_csv
+from ml_editor.model_v2 import (
+    SPACY_MODEL,
+    POS_NAMES,
+    DOC_FEATURE_NAMES,
+    get_doc_features,
+)
+
+DEFAULT_PATH = Path(myPath) / "../tests/fixtures/MiniPosts.xml"
+
+
+def get_avg_word_len(tokens):
+    if len(tokens) < 1:
+        return 0
+    lens = [len(x) for x in tokens]
+    return float(sum(lens) / len(lens))
+
+
+def legacy_doc_features(df):
+    """
+    Previous implementation of get_word_stats, without parsing
+    """
+    df['num_words'] = (
+        df["spacy_text"].apply(lambda x: 100 * len(x)) / df["num_chars"]
+    )
+    df["num_diff_words"] = df["spacy_text"].apply(lambda x: len(set(x)))
+    df["avg_word_len"] = df["spacy_text"].apply(lambda x: get_avg_word_len(x))
+    df["num_stops"] = (
+        df["spacy_text"].apply(
+            lambda x: 100*len([stop for stop in x if stop.is_stop])
+        )
+        / df["num_chars"]
+    )
+    pos_list = df["spacy_text"].apply(
+        lambda doc: [token.pos_ for token in doc]
+    )
+    for pos_name in POS_NAMES.keys():
+        df[pos_name] = (
+            pos_list.apply(
+                lambda x: len([match for match in x if match == pos_name])
+            )
+            / df["num_chars"]
+        )
+    return df
+
+
+if __name__ == '__main__':
+    num_questions = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    path = sys.argv[2] if len(sys.argv) > 2 else DEFAULT_PATH
+
+    posts = parse_xml_to_csv(path)
+    texts = posts["Title"].fillna("").str.cat(posts["body_text"], sep=" ")
+    texts = np.resize(texts.values, num_questions)
+
+    # Parse each distinct text once, and reuse its doc
+    spacy_model = SPACY_MODEL.get()
+    docs = {text: spacy_model(text) for text in set(texts)}
+    df = pd.DataFrame({"full_text": texts})
+    df["num_chars"] = df["full_text"].str.len()
+    df["spacy_text"] = [docs[text] for text in texts]
+
+    start = time.perf_counter()
+    legacy = legacy_doc_features(df.copy())[DOC_FEATURE_NAMES].values
+    legacy_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    fused = get_doc_features(df["spacy_text"], df["num_chars"])
+    fused_time = time.perf_counter() - start
+
+    assert np.allclose(legacy, fused, equal_nan=True)
+    print("questions: {}".format(num_questions))
+    print("previous extractor: {:.3f}s".format(legacy_time))
+    print("single pass:        {:.3f}s".format(fused_time))
+    print("speedup:            {:.1f}x".format(legacy_time / fused_time))
@@ -0,0 +1,98 @@
+"""
+Report the memory unique to each forked worker (USS) serving a model, when
+the model is loaded in every worker versus once before forking. Linux only,
+since it reads /proc/<pid>/smaps_rollup.
+
+Usage: python benchmarks/worker_memory.py [num_workers]
+"""
+import gc
+import os
+import sys
+import multiprocessing
+
+myPath = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, myPath + '/../')
+
+QUESTION = "How should I punctuate a list of items in a sentence?"
+
+
+def get_unique_memory():
+    """
+    Private memory of the current process in MB, pages it shares with
+    other processes are not counted
+    """
+    private_kb = 0
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            if line.startswith(("Private_Clean:", "Private_Dirty:")):
+                private_kb += int(line.split()[1])
+    return private_kb / 1024
+
+
+def get_model_module(version):
+    if version == "v1":
+        import ml_editor.model_v1 as module
+    elif version == "v2":
+        import ml_editor.model_v2 as module
+    else:
+        import ml_editor.model_v3 as module
+    return module
+
+
+def serve_one_question(version, results):
+    """
+    Worker: load the model if needed, score a question, report memory
+    """
+    module = get_model_module(version)
+    module.warm_up()
+    module.get_model_probabilities_for_input_texts([QUESTION])
+    results.put(get_unique_memory())
+
+
+def measure(version, preload, num_workers):
+    """
+    Fork workers from a fresh process, optionally loading the model first
+    """
+    context = multiprocessing.get_context("fork")
+    results = context.Queue()
+
+    def run_master():
+        if preload:
+            get_model_module(version).warm_up()
+            gc.collect()
+            gc.freeze()
+        workers = [
+            context.Process(target=serve_one_question, args=(version, results))
+            for _ in range(num_workers)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        if any(worker.exitcode != 0 for worker in workers):
+            sys.exit(1)
+
+    master = context.Process(target=run_master)
+    master.start()
+    master.join()
+    if master.exitcode != 0:
+        return None
+    usages = [results.get() for _ in range(num_workers)]
+    return sum(usages) / len(usages)
+
+
+def format_memory(usage):
+    return "failed" if usage is None else "{:.1f}MB".format(usage)
+
+
+if __name__ == '__main__':
+    num_workers = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+
+    print("Mean unique memory per worker, {} workers".format(num_workers))
+    print("{:<8}{:>16}{:>16}".format("model", "per worker", "preloaded"))
+    for version in ["v1", "v2", "v3"]:
+        print("{:<8}{:>16}{:>16}".format(
+            version,
+            format_memory(measure(version, False, num_workers)),
+            format_memory(measure(version, True, num_workers)),
+        ))
@@ -0,0 +1,40 @@
+"""
+Build the artifacts v3 explanations are served from, once the v3 model has
+been trained:
+- statistics of the explainer training data, which the LIME explainer is
+  rebuilt from instead of reading and splitting the training data
+- a lookup table of global explanations, used instead of LIME for requests
+  in the "surrogate" explanation mode
+
+Usage: python build_explanation_artifacts.py
+"""
+import os
+import sys
+
+myPath = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, myPath)
+
+from ml_editor.explanation_generation import (
+    build_explainer,
+    build_explanation_table,
+    curr_path,
+    explainer_stats_path,
+    explanation_table_path,
+    get_explainer_stats,
+    get_explainer_training_data,
+    save_explainer_stats,
+    save_explanation_table,
+)
+from ml_editor.model_v3 import MODEL
+
+
+if __name__ == '__main__':
+    train_features = get_explainer_training_data()
+
+    explainer_stats = get_explainer_stats(build_explainer(train_features))
+    save_explainer_stats(explainer_stats, curr_path / explainer_stats_path)
+    print("Saved {}".format((curr_path / explainer_stats_path).resolve()))
+
+    table = build_explanation_table(train_features, MODEL.get().predict_proba)
+    save_explanation_table(table, curr_path / explanation_table_path)
+    print("Saved {}".format((curr_path / explanation_table_path).resolve()))
@@ -0,0 +1,31 @@
+"""
+gunicorn settings for serving the ML Editor: gunicorn app:app
+
+Models are loaded once in the master process, before workers are forked, so
+that workers share their memory pages copy-on-write instead of each holding
+a copy of the spaCy vectors, vectorizers and classifiers.
+"""
+import gc
+import os
+
+bind = os.environ.get("ML_EDITOR_BIND", "0.0.0.0:5000")
+workers = int(os.environ.get("ML_EDITOR_WORKERS", 4))
+# Each open explanation stream holds a thread until its explanation is done,
+# so workers get one thread per stream on top of those serving requests.
+# Keep ML_EDITOR_MAX_STREAMS in sync with the app, which reads it too.
+threads = int(os.environ.get("ML_EDITOR_THREADS", 4)) + int(
+    os.environ.get("ML_EDITOR_MAX_STREAMS", 2)
+)
+
+# Import the app, and warm up its models, in the master process
+preload_app = True
+os.environ.setdefault("ML_EDITOR_WARM_UP", "v1,v2,v3")
+
+
+def when_ready(server):
+    """
+    Move every object loaded so far out of the garbage collector's reach,
+    so that collections in workers do not write to, and copy, shared pages
+    """
+    gc.collect()
+    gc.freeze()
@@ -0,0 +1,109 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+
+class RequestCoalescer:
+    """
+    Gathers items submitted concurrently by different threads, and processes
+    them together with a single call to a batch function. A batch is sent as
+    soon as it holds max_batch_size items, or max_wait seconds after its
+    first item arrived, which bounds the latency added to each request.
+
+    Parameters
+    ----------
+    batch_fn : callable
+        Takes a list of items, returns a list of results in the same order
+    max_batch_size : int, optional
+        Largest number of items processed at once, by default 32
+    max_wait : float, optional
+        Seconds to wait for other items after the first one of a batch,
+        by default 0.005
+    """
+
+    def __init__(self, batch_fn, max_batch_size=32, max_wait=0.005):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._lock = threading.Lock()
+        self._queue = None
+        self._pid = None
+
+    def submit(self, item):
+        """
+        Queue an item to be processed in the next batch
+
+        Parameters
+        ----------
+        item : object
+            Input to the batch function
+
+        Returns
+        -------
+            Future holding the result for this item
+        """
+        future = Future()
+        self._get_queue().put((item, future))
+        return future
+
+    def __call__(self, item):
+        """
+        Process an item as part of a batch and wait for its result
+        """
+        return self.submit(item).result()
+
+    def _get_queue(self):
+        """
+        Return the queue of pending items, starting the batching thread on
+        first use. Threads do not survive a fork, so a forked server worker
+        starts its own.
+        """
+        with self._lock:
+            if self._pid != os.getpid():
+                self._queue = queue.Queue()
+                self._pid = os.getpid()
+                thread = threading.Thread(
+                    target=self._run, args=(self._queue,), daemon=True
+                )
+                thread.start()
+            return self._queue
+
+    def _run(self, pending):
+        """
+        Build batches from pending items and process them, forever
+        """
+        while True:
+            batch = [pending.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(pending.get(timeout=timeout))
+                except queue.Empty:
+                    break
+            self._process(batch)
+
+    def _process(self, batch):
+        """
+        Run the batch function and hand each result to its caller
+        """
+        batch = [
+            (item, future)
+            for item, future in batch
+            if future.set_running_or_notify_cancel()
+        ]
+        if not batch:
+            return
+        items = [item for item, _ in batch]
+        try:
+            results = self.batch_fn(items)
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        for (_, future), result in zip(batch, results):
+            future.set_result(result)
@@ -1,4 +1,8 @@
 import os
+import re
+import json
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
 from pathlib import Path
 
 from tqdm import tqdm
@@ -6,8 +10,558 @@ from bs4 import BeautifulSoup
 import xml.etree.ElementTree as ELT
 import pandas as pd
 
+# Attributes of a row in a stackexchange Posts.xml dump. Streaming writers
+# need a fixed set of columns, since a chunk only holds the attributes it saw
+POST_COLUMNS = [
+    "Id",
+    "PostTypeId",
+    "AcceptedAnswerId",
+    "ParentId",
+    "CreationDate",
+    "DeletionDate",
+    "Score",
+    "ViewCount",
+    "Body",
+    "OwnerUserId",
+    "OwnerDisplayName",
+    "LastEditorUserId",
+    "LastEditorDisplayName",
+    "LastEditDate",
+    "LastActivityDate",
+    "Title",
+    "Tags",
+    "AnswerCount",
+    "CommentCount",
+    "FavoriteCount",
+    "ClosedDate",
+    "CommunityOwnedDate",
+    "ContentLicense",
+    "body_text",
+]
 
-def parse_xml_to_csv(path, save_path=None):
+# Columns stored as nullable integers in typed extracts, the others hold text
+INTEGER_COLUMNS = [
+    "Id",
+    "PostTypeId",
+    "AcceptedAnswerId",
+    "ParentId",
+    "Score",
+    "ViewCount",
+    "OwnerUserId",
+    "LastEditorUserId",
+    "AnswerCount",
+    "CommentCount",
+    "FavoriteCount",
+]
+
+# Columnar formats get_data_from_dump can cache extracts in
+CACHE_FORMATS = ["parquet", "feather"]
+
+# Tags the fast html decoder strips without building a tree. Bodies with any
+# other markup (scripts, comments, declarations...) go through BeautifulSoup
+SIMPLE_TAGS = {
+    "a", "b", "blockquote", "br", "code", "dd", "del", "div", "dl", "dt",
+    "em", "h1", "h2", "h3", "h4", "h5", "h6", "hr", "i", "img", "kbd", "li",
+    "ol", "p", "pre", "s", "span", "strike", "strong", "sub", "sup", "table",
+    "tbody", "td", "th", "thead", "tr", "ul",
+}
+VOID_TAGS = {"br", "hr", "img"}
+SIMPLE_ENTITIES = {
+    "amp": "&",
+    "lt": "<",
+    "gt": ">",
+    "quot": '"',
+    "nbsp": "\xa0",
+}
+TAG_PATTERN = re.compile(
+    r"""</?([a-zA-Z][a-zA-Z0-9]*)"""
+    r"""(?:\s+[^<>"']*(?:(?:"[^"]*"|'[^']*')[^<>"']*)*)?/?>"""
+)
+ASCII_SPACES = "\x20\x0a\x09\x0c\x0d"
+ENTITY_PATTERN = re.compile(r"&(?:#([0-9]+)|#[xX]([0-9a-fA-F]+)|([a-zA-Z]+));")
+
+
+def iter_xml_rows(path):
+    """
+    Incrementally parse an .xml posts dump, yielding one row at a time.
+    Elements are cleared as soon as they are read, so memory usage does not
+    grow with the size of the dump.
+
+    Parameters
+    ----------
+    path : str
+        Path to the xml document containing posts
+
+    Yields
+    ------
+    dict
+        Attributes of each row
+    """
+    context = ELT.iterparse(str(path), events=("start", "end"))
+    _, root = next(context)
+    for event, elem in context:
+        if event == "end" and elem.tag == "row":
+            yield dict(elem.attrib)
+            # Drop the element and its reference from the root
+            elem.clear()
+            root.clear()
+
+
+def unescape_simple_entities(text):
+    """
+    Replace the html entities of a text that contains no tags
+
+    Parameters
+    ----------
+    text : str
+        Text to unescape
+
+    Returns
+    -------
+    str or None
+        Unescaped text, or None if it contains a stray "&" or an entity
+        that might be decoded differently by BeautifulSoup
+    """
+    if "&" not in text:
+        return text
+    parts = []
+    pos = 0
+    for match in ENTITY_PATTERN.finditer(text):
+        segment = text[pos:match.start()]
+        if "&" in segment:
+            return None
+        dec, hexa, name = match.groups()
+        if name is not None:
+            char = SIMPLE_ENTITIES.get(name)
+            if char is None:
+                return None
+        else:
+            codepoint = int(dec) if dec is not None else int(hexa, 16)
+            # Control characters are mapped through windows-1252 by
+            # BeautifulSoup, leave them to it
+            if not (
+                codepoint in (9, 10, 13)
+                or 32 <= codepoint < 127
+                or 160 <= codepoint < 0xD800
+                or 0xE000 <= codepoint <= 0x10FFFF
+            ):
+                return None
+            char = chr(codepoint)
+        parts.append(segment)
+        parts.append(char)
+        pos = match.end()
+    if "&" in text[pos:]:
+        return None
+    parts.append(text[pos:])
+    return "".join(parts)
+
+
+def get_text_from_simple_html(html):
+    """
+    Decode the text of a post by stripping tags and unescaping entities,
+    without building a tree. Only handles the tags in SIMPLE_TAGS and the
+    entities in SIMPLE_ENTITIES or numeric ones, and reproduces the way
+    BeautifulSoup collapses whitespace between tags.
+
+    Parameters
+    ----------
+    html : str
+        html body of a post
+
+    Returns
+    -------
+    str or None
+        Decoded text, or None if the body contains markup this decoder
+        does not handle
+    """
+    decoded = []
+    pos = 0
+    # Open tags, needed to know whether we are inside a <pre> tag
+    tag_stack = []
+    for match in TAG_PATTERN.finditer(html):
+        tag_name = match.group(1).lower()
+        if tag_name not in SIMPLE_TAGS:
+            return None
+        text = decode_simple_text(html[pos:match.start()], "pre" in tag_stack)
+        if text is None:
+            return None
+        decoded.append(text)
+        pos = match.end()
+
+        tag = match.group(0)
+        if tag.startswith("</"):
+            if tag_name in VOID_TAGS:
+                return None
+            # Closing a tag also closes every tag opened after it
+            if tag_name in tag_stack:
+                last_open = len(tag_stack) - tag_stack[::-1].index(tag_name)
+                del tag_stack[last_open - 1:]
+        elif tag_name not in VOID_TAGS and not tag.endswith("/>"):
+            tag_stack.append(tag_name)
+
+    text = decode_simple_text(html[pos:], "pre" in tag_stack)
+    if text is None:
+        return None
+    decoded.append(text)
+    return "".join(decoded)
+
+
+def decode_simple_text(text, preserve_whitespace=False):
+    """
+    Decode a piece of text found between two tags
+
+    Parameters
+    ----------
+    text : str
+        Text between two tags
+    preserve_whitespace : bool, optional
+        Whether the text is inside a <pre> tag, by default False
+
+    Returns
+    -------
+    str or None
+        Decoded text, or None if it contains markup we do not handle
+    """
+    # A "<" left outside of a tag is markup we do not understand
+    if "<" in text:
+        return None
+    text = unescape_simple_entities(text)
+    if text is None:
+        return None
+    # Like BeautifulSoup, collapse strings made only of whitespace
+    if text and not preserve_whitespace and not text.strip(ASCII_SPACES):
+        return "\n" if "\n" in text else " "
+    return text
+
+
+def get_text_from_html(html, fast=True):
+    """
+    Decode the text of a post from its html body. Simple bodies are decoded
+    by get_text_from_simple_html, others by BeautifulSoup.
+
+    Parameters
+    ----------
+    html : str
+        html body of a post
+    fast : bool, optional
+        Try the fast decoder before BeautifulSoup, by default True
+
+    Returns
+    -------
+    str
+        Decoded text
+    """
+    if fast:
+        text = get_text_from_simple_html(html)
+        if text is not None:
+            return text
+    soup = BeautifulSoup(html, features='html.parser')
+    return soup.get_text()
+
+
+@contextmanager
+def get_decoding_executor(n_workers=1):
+    """
+    Context manager providing a process pool to decode post bodies with, or
+    None when decoding should happen in the current process
+
+    Parameters
+    ----------
+    n_workers : int, optional
+        Number of decoding processes, by default 1. None uses every core
+    """
+    if n_workers is None:
+        n_workers = os.cpu_count()
+    if n_workers <= 1:
+        yield None
+    else:
+        with ProcessPoolExecutor(max_workers=n_workers) as executor:
+            yield executor
+
+
+def decode_html_bodies(bodies, executor=None, chunksize=256, progress=False):
+    """
+    Decode the text of a list of html bodies, optionally across a process pool.
+    Texts are returned in the same order as the bodies.
+
+    Parameters
+    ----------
+    bodies : list of str
+        html bodies of posts
+    executor : concurrent.futures.Executor, optional
+        Pool to decode bodies with, by default None (decode in this process)
+    chunksize : int, optional
+        Number of bodies sent to a worker at once, by default 256
+    progress : bool, optional
+        Display a progress bar while decoding, by default False
+
+    Returns
+    -------
+    list of str
+        Decoded texts
+    """
+    if executor is None:
+        texts = map(get_text_from_html, bodies)
+    else:
+        texts = executor.map(get_text_from_html, bodies, chunksize=chunksize)
+    # Use tdqm to display progress since preprocessing takes time
+    return list(tqdm(texts, total=len(bodies), disable=not progress))
+
+
+def get_df_from_rows(
+    rows, start=0, progress=False, executor=None, chunksize=256
+):
+    """
+    Decode the body of each row and build a DataFrame from them
+
+    Parameters
+    ----------
+    rows : list of dict
+        Attributes of each row
+    start : int, optional
+        First value of the index of the DataFrame, by default 0
+    progress : bool, optional
+        Display a progress bar while decoding, by default False
+    executor : concurrent.futures.Executor, optional
+        Pool to decode bodies with, by default None (decode in this process)
+    chunksize : int, optional
+        Number of bodies sent to a worker at once, by default 256
+
+    Returns
+    -------
+    Pandas DataFrame
+        Processed text
+    """
+    texts = decode_html_bodies(
+        [item['Body'] for item in rows],
+        executor=executor,
+        chunksize=chunksize,
+        progress=progress,
+    )
+    for item, text in zip(rows, texts):
+        item['body_text'] = text
+    df = pd.DataFrame.from_dict(rows)
+    df.index = pd.RangeIndex(start, start + len(df))
+    return df
+
+
+def iter_posts_from_xml(
+    path, chunk_size=10000, n_workers=1, chunksize=256, row_filter=None
+):
+    """
+    Stream an .xml posts dump as DataFrames of at most chunk_size decoded
+    posts. Every chunk has the columns listed in POST_COLUMNS and an index
+    that continues from the previous chunk.
+
+    Parameters
+    ----------
+    path : str
+        Path to the xml document containing posts
+    chunk_size : int, optional
+        Maximum number of posts per DataFrame, by default 10000
+    n_workers : int, optional
+        Number of processes decoding html, by default 1. None uses every core
+    chunksize : int, optional
+        Number of bodies sent to a decoding process at once, by default 256
+    row_filter : callable, optional
+        Only keep rows for which row_filter(row) is True. Rows are filtered
+        before decoding, by default None (keep every row)
+
+    Yields
+    ------
+    Pandas DataFrame
+        Processed text
+    """
+    with get_decoding_executor(n_workers) as executor:
+        rows = []
+        start = 0
+        for row in tqdm(iter_xml_rows(path)):
+            if row_filter is not None and not row_filter(row):
+                continue
+            rows.append(row)
+            if len(rows) == chunk_size:
+                df = get_df_from_rows(
+                    rows, start, executor=executor, chunksize=chunksize
+                )
+                yield df.reindex(columns=POST_COLUMNS)
+                start += len(rows)
+                rows = []
+        if rows:
+            df = get_df_from_rows(
+                rows, start, executor=executor, chunksize=chunksize
+            )
+            yield df.reindex(columns=POST_COLUMNS)
+
+
+def stream_xml_to_file(
+    path, save_path, chunk_size=10000, n_workers=1, chunksize=256
+):
+    """
+    Convert an .xml posts dump to a csv or parquet file one chunk at a time,
+    so that peak memory only depends on chunk_size. The format is picked from
+    the extension of save_path, writing parquet requires pyarrow.
+
+    Parameters
+    ----------
+    path : str
+        Path to the xml document containing posts
+    save_path : str
+        Path to save the decoded posts, either a .csv or a .parquet file
+    chunk_size : int, optional
+        Number of posts held in memory at once, by default 10000
+    n_workers : int, optional
+        Number of processes decoding html, by default 1. None uses every core
+    chunksize : int, optional
+        Number of bodies sent to a decoding process at once, by default 256
+
+    Returns
+    -------
+    int
+        Number of posts written
+    """
+    chunks = iter_posts_from_xml(
+        path, chunk_size=chunk_size, n_workers=n_workers, chunksize=chunksize
+    )
+    if Path(save_path).suffix == ".parquet":
+        return write_chunks_to_parquet(chunks, save_path)
+    return write_chunks_to_csv(chunks, save_path)
+
+
+def write_chunks_to_csv(chunks, save_path):
+    """
+    Write DataFrame chunks sharing the same columns to a single csv file
+
+    Parameters
+    ----------
+    chunks : iterable of Pandas DataFrame
+        Chunks to write, in order
+    save_path : str
+        Path to the csv file
+
+    Returns
+    -------
+    int
+        Number of rows written
+    """
+    num_rows = 0
+    for i, chunk in enumerate(chunks):
+        chunk.to_csv(save_path, mode="w" if i == 0 else "a", header=i == 0)
+        num_rows += len(chunk)
+    return num_rows
+
+
+def cast_post_types(df):
+    """
+    Cast the columns listed in INTEGER_COLUMNS to nullable integers
+
+    Parameters
+    ----------
+    df : Pandas DataFrame
+        Posts, with every column holding text
+
+    Returns
+    -------
+    Pandas DataFrame
+        Posts with typed columns
+    """
+    for col in INTEGER_COLUMNS:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col]).astype("Int64")
+    return df
+
+
+def get_arrow_table(chunk):
+    """
+    Convert a chunk of posts with POST_COLUMNS to a typed arrow table
+
+    Parameters
+    ----------
+    chunk : Pandas DataFrame
+        Posts, with every column holding text
+
+    Returns
+    -------
+    pyarrow Table
+        Typed table, with the same schema for every chunk
+    """
+    import pyarrow as pa
+
+    schema = pa.schema(
+        [
+            (col, pa.int64() if col in INTEGER_COLUMNS else pa.string())
+            for col in POST_COLUMNS
+        ]
+    )
+    return pa.Table.from_pandas(
+        cast_post_types(chunk), schema=schema, preserve_index=False
+    )
+
+
+def write_chunks_to_parquet(chunks, save_path):
+    """
+    Write DataFrame chunks with POST_COLUMNS to a single typed parquet file,
+    one row group per chunk
+
+    Parameters
+    ----------
+    chunks : iterable of Pandas DataFrame
+        Chunks to write, in order
+    save_path : str
+        Path to the parquet file
+
+    Returns
+    -------
+    int
+        Number of rows written
+    """
+    import pyarrow.parquet as pq
+
+    num_rows = 0
+    writer = None
+    try:
+        for chunk in chunks:
+            table = get_arrow_table(chunk)
+            if writer is None:
+                writer = pq.ParquetWriter(str(save_path), table.schema)
+            writer.write_table(table)
+            num_rows += len(chunk)
+    finally:
+        if writer is not None:
+            writer.close()
+    return num_rows
+
+
+def write_chunks_to_feather(chunks, save_path):
+    """
+    Write DataFrame chunks with POST_COLUMNS to a single typed feather file.
+    Unlike parquet, the whole table is held in memory before being written.
+    Writing a Table, whose columns may span several chunks, needs the
+    Feather V2 writer of pyarrow 0.17 or later.
+
+    Parameters
+    ----------
+    chunks : iterable of Pandas DataFrame
+        Chunks to write, in order
+    save_path : str
+        Path to the feather file
+
+    Returns
+    -------
+    int
+        Number of rows written
+    """
+    import pyarrow as pa
+    import pyarrow.feather as feather
+
+    tables = [get_arrow_table(chunk) for chunk in chunks]
+    if not tables:
+        tables = [get_arrow_table(pd.DataFrame(columns=POST_COLUMNS))]
+    table = pa.concat_tables(tables)
+    feather.write_feather(table, str(save_path))
+    return table.num_rows
+
+
+def parse_xml_to_csv(path, save_path=None, n_workers=1, chunksize=256):
     """
     Open .xml posts dump and convert the text to a csv, tokenizing it in the process
     
@@ -17,6 +571,10 @@ def parse_xml_to_csv(path, save_path=None):
         Path to the xml document containing posts
     save_path : str, optional
         Path to save the decoded xml as a csv file, by default None
+    n_workers : int, optional
+        Number of processes decoding html, by default 1. None uses every core
+    chunksize : int, optional
+        Number of bodies sent to a decoding process at once, by default 256
     
     Returns
     -------
@@ -24,29 +582,355 @@ def parse_xml_to_csv(path, save_path=None):
         Processed text
     """
 
-    # Use Python's standard library to parse XML file
-    doc = ELT.parse(path)
-    root = doc.getroot()
+    # Each row is a question, parsed incrementally to avoid holding the tree
+    all_rows = list(iter_xml_rows(path))
 
-    # Each row is a question
-    all_rows = [row.attrib for row in root.findall('row')]
-    
-    # Use tdqm to display progress since preprocessing takes time
-    for item in tqdm(all_rows):
-        # Decode text from html
-        soup = BeautifulSoup(item['Body'], features='html.parser')
-        item['body_text'] = soup.get_text()
-    
     # Create dataframe from our list of dictionaries
-    df = pd.DataFrame.from_dict(all_rows)
+    with get_decoding_executor(n_workers) as executor:
+        df = get_df_from_rows(
+            all_rows, progress=True, executor=executor, chunksize=chunksize
+        )
     if save_path:
         df.to_csv(save_path)
     return df
 
 
-def get_data_from_dump(site_name, load_existing=True):
+def get_source_signature(path):
+    """
+    Describe the state of a source file, used to detect changes to it
+
+    Parameters
+    ----------
+    path : str
+        Path to the source file
+
+    Returns
+    -------
+    dict
+        Modification time and size of the file
+    """
+    stat = os.stat(path)
+    return {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size}
+
+
+def get_cache_metadata_path(extracted_path):
+    """
+    Path of the file describing the source of an extract
+
+    Parameters
+    ----------
+    extracted_path : Path
+        Path to the extract
     """
-    Load .xml dump, parse it to a csv, serialize it and return it.
+    return extracted_path.with_name(extracted_path.name + ".json")
+
+
+def read_cache_metadata(extracted_path):
+    """
+    Load the description of an extract, or an empty dict if it has none
+
+    Parameters
+    ----------
+    extracted_path : Path
+        Path to the extract
+    """
+    metadata_path = get_cache_metadata_path(extracted_path)
+    if not os.path.isfile(metadata_path):
+        return {}
+    with open(metadata_path) as f:
+        return json.load(f)
+
+
+def write_cache_metadata(extracted_path, cache_format, source):
+    """
+    Describe an extract: the state of the dump it was built from, and the
+    highest Id and LastActivityDate it contains, used by incremental updates
+
+    Parameters
+    ----------
+    extracted_path : Path
+        Path to the extract
+    cache_format : str
+        One of CACHE_FORMATS
+    source : dict
+        Signature of the dump, as returned by get_source_signature
+    """
+    df = read_cache(
+        extracted_path, cache_format, columns=["Id", "LastActivityDate"]
+    )
+    metadata = {
+        "format": cache_format,
+        "source": source,
+        "rows": len(df),
+        "max_id": int(df["Id"].max()) if len(df) else None,
+        "max_last_activity_date": df["LastActivityDate"].max()
+        if len(df) else None,
+    }
+    with open(get_cache_metadata_path(extracted_path), "w") as f:
+        json.dump(metadata, f)
+    return metadata
+
+
+def is_cache_valid(extracted_path, dump_path):
+    """
+    Check whether an extract exists and was built from the current dump.
+    An extract without its dump is considered valid.
+
+    Parameters
+    ----------
+    extracted_path : Path
+        Path to the extract
+    dump_path : Path
+        Path to the .xml dump the extract is built from
+    """
+    if not os.path.isfile(extracted_path):
+        return False
+    if not os.path.isfile(dump_path):
+        return True
+    metadata = read_cache_metadata(extracted_path)
+    return metadata.get("source") == get_source_signature(dump_path)
+
+
+def build_cache(dump_path, extracted_path, cache_format="parquet", **kwargs):
+    """
+    Stream an .xml dump to a typed columnar extract, and record the state of
+    the dump it was built from. The extract is written to a temporary file
+    first so that an interrupted build never leaves a truncated cache.
+
+    Parameters
+    ----------
+    dump_path : Path
+        Path to the .xml dump
+    extracted_path : Path
+        Path to the extract
+    cache_format : str, optional
+        One of CACHE_FORMATS, by default "parquet"
+    kwargs :
+        Passed to iter_posts_from_xml
+
+    Returns
+    -------
+    int
+        Number of posts written
+    """
+    if cache_format not in CACHE_FORMATS:
+        raise ValueError("Unknown cache format {}".format(cache_format))
+    source = get_source_signature(dump_path)
+    chunks = iter_posts_from_xml(dump_path, **kwargs)
+    num_rows = write_cache(chunks, extracted_path, cache_format)
+    write_cache_metadata(extracted_path, cache_format, source)
+    return num_rows
+
+
+def write_cache(chunks, extracted_path, cache_format="parquet"):
+    """
+    Write chunks of posts to an extract, through a temporary file
+
+    Parameters
+    ----------
+    chunks : iterable of Pandas DataFrame
+        Posts with POST_COLUMNS, in order
+    extracted_path : Path
+        Path to the extract
+    cache_format : str, optional
+        One of CACHE_FORMATS, by default "parquet"
+
+    Returns
+    -------
+    int
+        Number of posts written
+    """
+    tmp_path = extracted_path.with_name(extracted_path.name + ".tmp")
+    if cache_format == "parquet":
+        num_rows = write_chunks_to_parquet(chunks, tmp_path)
+    else:
+        num_rows = write_chunks_to_feather(chunks, tmp_path)
+    os.replace(tmp_path, extracted_path)
+    return num_rows
+
+
+def update_cache(dump_path, extracted_path, cache_format="parquet", **kwargs):
+    """
+    Refresh an extract from a newer dump by only decoding the posts with an
+    Id or LastActivityDate higher than the ones recorded for the extract,
+    and merging them into it chunk by chunk, so that the extract is never
+    loaded whole. Only the new and changed posts are held in memory. Posts
+    deleted from the dump are kept, a full rebuild is needed to drop them.
+
+    Parameters
+    ----------
+    dump_path : Path
+        Path to the .xml dump
+    extracted_path : Path
+        Path to an existing extract with its metadata
+    cache_format : str, optional
+        One of CACHE_FORMATS, by default "parquet"
+    kwargs :
+        Passed to iter_posts_from_xml
+
+    Returns
+    -------
+    int
+        Number of new or changed posts
+    """
+    metadata = read_cache_metadata(extracted_path)
+    max_id = metadata["max_id"]
+    max_date = metadata["max_last_activity_date"]
+
+    def is_new_or_changed(row):
+        # Ids and ISO dates increase with time, comparing them is enough
+        return (
+            int(row["Id"]) > max_id
+            or row.get("LastActivityDate", "") > max_date
+        )
+
+    source = get_source_signature(dump_path)
+    chunks = list(
+        iter_posts_from_xml(dump_path, row_filter=is_new_or_changed, **kwargs)
+    )
+    if chunks:
+        chunk_size = kwargs.get("chunk_size", 10000)
+        changed = cast_post_types(pd.concat(chunks))
+        existing = iter_cache_chunks(extracted_path, cache_format, chunk_size)
+        write_cache(
+            merge_posts_by_id(existing, changed, chunk_size),
+            extracted_path,
+            cache_format,
+        )
+    write_cache_metadata(extracted_path, cache_format, source)
+    return sum(len(chunk) for chunk in chunks)
+
+
+def iter_cache_chunks(
+    extracted_path, cache_format="parquet", chunk_size=10000
+):
+    """
+    Stream a typed columnar extract as DataFrames of at most chunk_size
+    posts. Parquet extracts are read one batch at a time, which needs
+    pyarrow 3.0 or later, feather extracts are memory mapped but compressed
+    ones are decompressed whole.
+
+    Parameters
+    ----------
+    extracted_path : Path
+        Path to the extract
+    cache_format : str, optional
+        One of CACHE_FORMATS, by default "parquet"
+    chunk_size : int, optional
+        Maximum number of posts per DataFrame, by default 10000
+
+    Yields
+    ------
+    Pandas DataFrame
+        Posts, with integer columns typed like read_cache
+    """
+    import pyarrow as pa
+    import pyarrow.feather as feather
+    import pyarrow.parquet as pq
+
+    if cache_format == "parquet":
+        batches = pq.ParquetFile(str(extracted_path)).iter_batches(
+            batch_size=chunk_size
+        )
+    elif cache_format == "feather":
+        table = feather.read_table(str(extracted_path), memory_map=True)
+        batches = table.to_batches(max_chunksize=chunk_size)
+    else:
+        raise ValueError("Unknown cache format {}".format(cache_format))
+    types_mapper = {pa.int64(): pd.Int64Dtype()}.get
+    for batch in batches:
+        yield batch.to_pandas(types_mapper=types_mapper)
+
+
+def merge_posts_by_id(chunks, changed, chunk_size=10000):
+    """
+    Merge new and changed posts into chunks of existing posts sorted by Id,
+    replacing the existing posts that share their Id. Only one chunk of
+    existing posts is held in memory at a time.
+
+    Parameters
+    ----------
+    chunks : iterable of Pandas DataFrame
+        Existing posts, sorted by Id
+    changed : Pandas DataFrame
+        New and changed posts
+    chunk_size : int, optional
+        Maximum number of changed posts per chunk once the existing posts
+        are exhausted, by default 10000
+
+    Yields
+    ------
+    Pandas DataFrame
+        Merged posts, sorted by Id
+    """
+    changed = changed.sort_values("Id").reset_index(drop=True)
+    start = 0
+    for chunk in chunks:
+        chunk = chunk[~chunk["Id"].isin(changed["Id"])]
+        if chunk.empty:
+            continue
+        # Changed posts up to the last Id of the chunk belong with it
+        end = changed["Id"].searchsorted(chunk["Id"].iloc[-1], side="right")
+        merged = pd.concat([chunk, changed.iloc[start:end]])
+        start = end
+        yield merged.sort_values("Id").reset_index(drop=True)
+    for i in range(start, len(changed), chunk_size):
+        yield changed.iloc[i:i + chunk_size].reset_index(drop=True)
+
+
+def can_update_cache(extracted_path, cache_format):
+    """
+    Check whether an extract can be refreshed incrementally
+
+    Parameters
+    ----------
+    extracted_path : Path
+        Path to the extract
+    cache_format : str
+        One of CACHE_FORMATS
+    """
+    metadata = read_cache_metadata(extracted_path)
+    return (
+        os.path.isfile(extracted_path)
+        and metadata.get("format") == cache_format
+        and metadata.get("max_id") is not None
+        and metadata.get("max_last_activity_date") is not None
+    )
+
+
+def read_cache(extracted_path, cache_format="parquet", columns=None):
+    """
+    Load a typed columnar extract
+
+    Parameters
+    ----------
+    extracted_path : Path
+        Path to the extract
+    cache_format : str, optional
+        One of CACHE_FORMATS, by default "parquet"
+    columns : list of str, optional
+        Only read these columns, by default None (read every column)
+    """
+    if cache_format == "parquet":
+        return pd.read_parquet(extracted_path, columns=columns)
+    if cache_format == "feather":
+        return pd.read_feather(extracted_path, columns=columns)
+    raise ValueError("Unknown cache format {}".format(cache_format))
+
+
+def get_data_from_dump(
+    site_name,
+    load_existing=True,
+    columns=None,
+    cache_format="parquet",
+    data_path="data",
+    incremental=False,
+    **kwargs
+):
+    """
+    Load .xml dump, parse it, cache it in a typed columnar format and return
+    it. The cache is rebuilt whenever the dump's modification time or size
+    changes, or only updated with new and changed posts in incremental mode.
     
     Parameters
     ----------
@@ -54,20 +938,33 @@ def get_data_from_dump(site_name, load_existing=True):
         Name of the stackexchange site
     load_existing : bool, optional
         Should we load the existing extract or regenerate it, by default True
+    columns : list of str, optional
+        Only load these columns, by default None (load every column)
+    cache_format : str, optional
+        One of CACHE_FORMATS, by default "parquet"
+    data_path : str, optional
+        Directory containing the dumps and extracts, by default "data"
+    incremental : bool, optional
+        Only decode posts that are new or changed since the existing extract
+        was built and merge them into it, by default False
+    kwargs :
+        Passed to iter_posts_from_xml when the extract is (re)built
     """
-    data_path = Path("data")
+    data_path = Path(data_path)
     dump_name = '{:s}.stackexchange.com/Posts.xml'.format(site_name)
-    extracted_name = "{:s}.csv".format(site_name)
-    dump_path = data_path / dump_path
+    extracted_name = "{:s}.{:s}".format(site_name, cache_format)
+    dump_path = data_path / dump_name
     extracted_path = data_path / extracted_name
 
-    if not (load_existing and os.path.isfile(extracted_path)):
-        all_data = parse_xml_to_csv(dump_path)
-        all_data.to_csv(extracted_path)
-    else:
-        all_data = pd.DataFrame.from_csv(extracted_path)
+    if not load_existing:
+        build_cache(dump_path, extracted_path, cache_format, **kwargs)
+    elif not is_cache_valid(extracted_path, dump_path):
+        if incremental and can_update_cache(extracted_path, cache_format):
+            update_cache(dump_path, extracted_path, cache_format, **kwargs)
+        else:
+            build_cache(dump_path, extracted_path, cache_format, **kwargs)
 
-    return all_data
+    return read_cache(extracted_path, cache_format, columns)
 
 
 if __name__ == '__main__':
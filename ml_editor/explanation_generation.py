@@ -1,9 +1,14 @@
 import os
+import copy
+import json
+from bisect import bisect_left
 from pathlib import Path
+import numpy as np
 import pandas as pd 
-from lime.lime_tabular import LimeTabularExplainer
+from sklearn.utils import check_random_state
 
 from ml_editor.data_processing import get_split_by_author
+from ml_editor.resources import LazyResource, record_artifact_signature
 
 FEATURE_DISPLAY_NAMES = {
     "num_questions": "frequency of question marks",
@@ -75,29 +80,534 @@ FEATURE_ARR = [
 ]
 FEATURE_ARR.extend(POS_NAMES.keys())
 
+curr_path = Path(os.path.dirname(__file__))
+data_path = Path('../data/writers_with_features.csv')
+# Artifacts built offline with build_explanation_artifacts.py: statistics
+# of the training data the explainer is rebuilt from, and global explanations
+explainer_stats_path = Path('../models/explainer_stats.json')
+EXPLAINER_STATS_VERSION = 1
+explanation_table_path = Path('../models/explanation_table.json')
+EXPLANATION_TABLE_VERSION = 1
+CLASS_NAMES = ['low', 'high']
 
-def get_explainer():
+
+def get_explainer_training_data():
     """
-    Prepare LIME explainer using our training data. This is fast enough that
-    we do not bother with serialising it.
+    Features of the questions explanations are based on, the training split
+    of the data the v3 model was trained on
 
     Returns
     -------
-        LIME explainer object
+        DataFrame with one column per feature of FEATURE_ARR
     """
-    curr_path = Path(os.path.dirname(__file__))
-    data_path = Path('../data/writers_with_features.csv')
     df = pd.read_csv(curr_path / data_path)
     train_df, test_df = get_split_by_author(df, test_size=0.2, random_state=42)
-    explainer = LimeTabularExplainer(
-        train_df[FEATURE_ARR].values,
+    return train_df[FEATURE_ARR]
+
+
+def build_explainer(train_features):
+    """
+    Prepare LIME explainer from training data
+    
+    Parameters
+    ----------
+    train_features : DataFrame
+        Training features, one column per feature of FEATURE_ARR
+
+    Returns
+    -------
+        LIME explainer object
+    """
+    from lime.lime_tabular import LimeTabularExplainer
+
+    return LimeTabularExplainer(
+        train_features[FEATURE_ARR].values,
         feature_names=FEATURE_ARR,
-        class_names=['low', 'high'],
+        class_names=CLASS_NAMES,
+    )
+
+
+def get_explainer_stats(explainer):
+    """
+    Summary statistics of the training data of an explainer, which are all
+    it needs to explain predictions: for each feature, the quartile
+    boundaries of its bins, the frequency of each bin and the mean, standard
+    deviation, minimum and maximum of the values in each bin
+    
+    Parameters
+    ----------
+    explainer : LimeTabularExplainer
+        Explainer built with the default quartile discretizer
+
+    Returns
+    -------
+        JSON serializable dictionary
+    """
+    discretizer = explainer.discretizer
+    features = range(len(FEATURE_ARR))
+    stats = {
+        "means": discretizer.means,
+        "stds": discretizer.stds,
+        "mins": discretizer.mins,
+        "maxs": discretizer.maxs,
+        # Boundaries are the minimum of every bin but the first
+        "bins": {f: discretizer.mins[f][1:] for f in features},
+        "feature_values": explainer.feature_values,
+        "feature_frequencies": explainer.feature_frequencies,
+    }
+    return {
+        "version": EXPLAINER_STATS_VERSION,
+        "feature_names": FEATURE_ARR,
+        "class_names": CLASS_NAMES,
+        "training_data_stats": {
+            name: {
+                str(f): np.asarray(values[f], dtype=float).tolist()
+                for f in features
+            }
+            for name, values in stats.items()
+        },
+    }
+
+
+def save_explainer_stats(explainer_stats, path):
+    """
+    Write explainer statistics returned by get_explainer_stats
+    
+    Parameters
+    ----------
+    explainer_stats : dict
+        Explainer statistics
+    path : Path
+        Destination of the JSON statistics
+    """
+    with open(path, "w") as f:
+        json.dump(explainer_stats, f)
+
+
+def load_explainer(path):
+    """
+    Rebuild a LIME explainer from statistics saved by save_explainer_stats,
+    without reading the training data
+    
+    Parameters
+    ----------
+    path : Path
+        Path of the JSON statistics
+
+    Returns
+    -------
+        LIME explainer object
+    """
+    from lime.lime_tabular import LimeTabularExplainer
+
+    with open(path) as f:
+        explainer_stats = json.load(f)
+    if explainer_stats.get("version") != EXPLAINER_STATS_VERSION:
+        raise ValueError(
+            "Explainer statistics version {} is not supported, rebuild them "
+            "with build_explanation_artifacts.py".format(
+                explainer_stats.get("version")
+            )
+        )
+    if explainer_stats["feature_names"] != FEATURE_ARR:
+        raise ValueError(
+            "Explainer statistics features differ from FEATURE_ARR"
+        )
+
+    # JSON keys are strings, LIME looks statistics up by feature index
+    stats = {
+        name: {int(f): np.array(values) for f, values in by_feature.items()}
+        for name, by_feature in explainer_stats["training_data_stats"].items()
+    }
+    # LIME still expects training data, two rows spanning the range of each
+    # feature are enough since every statistic is provided
+    features = range(len(FEATURE_ARR))
+    training_data = np.array(
+        [
+            [stats["mins"][f][0] for f in features],
+            [stats["maxs"][f][-1] for f in features],
+        ]
+    )
+    return LimeTabularExplainer(
+        training_data,
+        feature_names=FEATURE_ARR,
+        class_names=explainer_stats["class_names"],
+        training_data_stats=stats,
+    )
+
+
+def get_explainer():
+    """
+    Prepare LIME explainer, from the statistics built offline if they exist
+    and from our training data otherwise. It is only done on first use.
+
+    Returns
+    -------
+        LIME explainer object
+    """
+    if (curr_path / explainer_stats_path).exists():
+        return load_explainer(curr_path / explainer_stats_path)
+    return build_explainer(get_explainer_training_data())
+
+
+EXPLAINER = LazyResource(get_explainer)
+
+
+def get_bin_names(feature_name, thresholds):
+    """
+    Conditions describing each bin of a feature, formatted like the ones of
+    LIME's discretizer so that parse_explanations handles them
+    
+    Parameters
+    ----------
+    feature_name : str
+        Name of the feature
+    thresholds : list of float
+        Increasing bin boundaries
+
+    Returns
+    -------
+        List of len(thresholds) + 1 conditions
+    """
+    names = ['%s <= %.2f' % (feature_name, thresholds[0])]
+    for low, high in zip(thresholds[:-1], thresholds[1:]):
+        names.append('%.2f < %s <= %.2f' % (low, feature_name, high))
+    names.append('%s > %.2f' % (feature_name, thresholds[-1]))
+    return names
+
+
+def build_explanation_table(
+    train_features, predict_fn, num_rows=1000, random_state=42
+):
+    """
+    Precompute global explanations of a model. Each feature is split in
+    quartile bins over the training data, like LIME's discretizer does. The
+    impact of a bin is the average positive probability of training
+    questions when the feature is set to the mean value of the bin (partial
+    dependence), minus its average over the bins of the feature.
+    
+    Parameters
+    ----------
+    train_features : DataFrame
+        Training features, one column per feature of FEATURE_ARR
+    predict_fn : callable
+        Returns the probabilities of each class for an array of features
+    num_rows : int, optional
+        Number of training questions impacts are averaged over, by default
+        1000
+    random_state : int, optional
+        Seed used to sample training questions, by default 42
+
+    Returns
+    -------
+        Lookup table, a JSON serializable dictionary
+    """
+    values = train_features[FEATURE_ARR].values.astype(float)
+    random_state = check_random_state(random_state)
+    rows = values[
+        random_state.choice(
+            len(values), min(num_rows, len(values)), replace=False
+        )
+    ]
+
+    features = []
+    for i, feature_name in enumerate(FEATURE_ARR):
+        thresholds = np.unique(np.percentile(values[:, i], [25, 50, 75]))
+        bins = np.searchsorted(thresholds, values[:, i])
+        bin_values = [
+            values[bins == b, i].mean()
+            if (bins == b).any()
+            else thresholds[min(b, len(thresholds) - 1)]
+            for b in range(len(thresholds) + 1)
+        ]
+        # Score every sampled question with the feature set to each bin value
+        perturbed = np.tile(rows, (len(bin_values), 1))
+        perturbed[:, i] = np.repeat(bin_values, len(rows))
+        probas = predict_fn(perturbed)[:, 1].reshape(len(bin_values), -1)
+        dependence = probas.mean(axis=1)
+        features.append(
+            {
+                "name": feature_name,
+                "thresholds": thresholds.tolist(),
+                "impacts": (dependence - dependence.mean()).tolist(),
+            }
+        )
+    return {"version": EXPLANATION_TABLE_VERSION, "features": features}
+
+
+def save_explanation_table(table, path):
+    """
+    Write an explanation table built by build_explanation_table
+    
+    Parameters
+    ----------
+    table : dict
+        Lookup table
+    path : Path
+        Destination of the JSON table
+    """
+    with open(path, "w") as f:
+        json.dump(table, f)
+
+
+def load_explanation_table(path):
+    """
+    Read an explanation table, checking it was built by this version of the
+    code
+    
+    Parameters
+    ----------
+    path : Path
+        Path of the JSON table
+
+    Returns
+    -------
+        Lookup table
+    """
+    with open(path) as f:
+        info = os.fstat(f.fileno())
+        table = json.load(f)
+    record_artifact_signature(path, info)
+    if table.get("version") != EXPLANATION_TABLE_VERSION:
+        raise ValueError(
+            "Explanation table version {} is not supported, rebuild it with "
+            "build_explanation_artifacts.py".format(table.get("version"))
+        )
+    if [feature["name"] for feature in table["features"]] != FEATURE_ARR:
+        raise ValueError("Explanation table features differ from FEATURE_ARR")
+    for feature in table["features"]:
+        feature["bin_names"] = get_bin_names(
+            feature["name"], feature["thresholds"]
+        )
+    return table
+
+
+EXPLANATION_TABLE = LazyResource(
+    lambda: load_explanation_table(curr_path / explanation_table_path)
+)
+
+
+def explain_features_from_table(features, num_feats=10, table=None):
+    """
+    Explain the prediction for one question by looking up the bin of each
+    of its features in the explanation table, without calling the model
+    
+    Parameters
+    ----------
+    features : array-like
+        Features of the question, in the order of FEATURE_ARR
+    num_feats : int, optional
+        Number of features in the explanation, by default 10
+    table : dict, optional
+        Lookup table, by default the one of EXPLANATION_TABLE
+
+    Returns
+    -------
+        List of (condition, impact) pairs by decreasing absolute impact, in
+        the format of LIME's Explanation.as_list
+    """
+    if table is None:
+        table = EXPLANATION_TABLE.get()
+    exp_list = []
+    for feature, value in zip(table["features"], features):
+        # Same bins as np.searchsorted, without its overhead on tiny arrays
+        bin_index = bisect_left(feature["thresholds"], value)
+        exp_list.append(
+            (feature["bin_names"][bin_index], feature["impacts"][bin_index])
+        )
+    exp_list.sort(key=lambda exp: abs(exp[1]), reverse=True)
+    return exp_list[:num_feats]
+
+
+def get_seeded_explainer(explainer, random_state):
+    """
+    Shallow copy of an explainer drawing its perturbations from a given seed,
+    so that explanations are reproducible. The shared explainer is left
+    untouched.
+    
+    Parameters
+    ----------
+    explainer : LimeTabularExplainer
+        Explainer to copy
+    random_state : int or numpy RandomState
+        Seed of the perturbations
+
+    Returns
+    -------
+        Seeded LIME explainer object
+    """
+    random_state = check_random_state(random_state)
+    seeded = copy.copy(explainer)
+    seeded.random_state = random_state
+    seeded.base = copy.copy(explainer.base)
+    seeded.base.random_state = random_state
+    if explainer.discretizer is not None:
+        seeded.discretizer = copy.copy(explainer.discretizer)
+        seeded.discretizer.random_state = random_state
+    return seeded
+
+
+def get_top_features(exp):
+    """
+    Indices of the features of an explanation, by decreasing importance
+    """
+    return [feat_id for feat_id, _ in exp.as_map()[1]]
+
+
+def get_prefix_explainer(explainer, features, num_samples):
+    """
+    Shallow copy of an explainer which draws num_samples perturbations of a
+    question once, and then explains it with the first n of them for any
+    budget n given to explain_instance. Larger budgets extend the
+    perturbations of smaller ones instead of drawing new ones. This
+    overrides the private sampling method of LimeTabularExplainer.
+    
+    Parameters
+    ----------
+    explainer : LimeTabularExplainer
+        Explainer to copy
+    features : array-like
+        Features of the question
+    num_samples : int
+        Largest budget
+
+    Returns
+    -------
+        LIME explainer object for this question only
+    """
+    data, inverse = explainer._LimeTabularExplainer__data_inverse(
+        features, num_samples
+    )
+    prefix_explainer = copy.copy(explainer)
+    prefix_explainer._LimeTabularExplainer__data_inverse = (
+        lambda data_row, budget: (data[:budget], inverse[:budget])
+    )
+    return prefix_explainer
+
+
+def get_prefix_predictor(predict_fn):
+    """
+    Wrap a model for explanations whose perturbations grow by extending
+    previous ones, so that only the new perturbations are predicted
+    
+    Parameters
+    ----------
+    predict_fn : callable
+        Returns the probabilities of each class for an array of features
+
+    Returns
+    -------
+        Function with the same signature as predict_fn
+    """
+    probs = []
+
+    def predict_prefix(inverse):
+        num_predicted = sum(len(prob) for prob in probs)
+        if len(inverse) > num_predicted:
+            probs.append(predict_fn(inverse[num_predicted:]))
+        return np.vstack(probs)[:len(inverse)]
+
+    return predict_prefix
+
+
+def explain_features(
+    features,
+    predict_fn,
+    num_feats=10,
+    num_samples=5000,
+    min_samples=None,
+    top_k=3,
+    random_state=None,
+):
+    """
+    Explain the prediction of a model for one question with LIME. When
+    min_samples is given, explanations start with min_samples perturbations
+    and double them until the ranking of the top_k most important features
+    is the same for two budgets in a row, or num_samples is reached. Each
+    budget extends the perturbations of the previous one, so at most
+    num_samples perturbations are drawn and predicted.
+    
+    Parameters
+    ----------
+    features : array-like
+        Features of the question
+    predict_fn : callable
+        Returns the probabilities of each class for an array of features
+    num_feats : int, optional
+        Number of features in the explanation, by default 10
+    num_samples : int, optional
+        Largest number of perturbations, by default 5000 like LIME
+    min_samples : int, optional
+        Number of perturbations to start from, by default None which always
+        uses num_samples
+    top_k : int, optional
+        Number of features whose ranking must be stable, by default 3
+    random_state : int, optional
+        Seed of the perturbations, by default None (not reproducible)
+
+    Returns
+    -------
+        LIME explanation of the positive class
+    """
+    explainer = EXPLAINER.get()
+    if random_state is not None:
+        explainer = get_seeded_explainer(explainer, random_state)
+    if min_samples is None or min_samples >= num_samples:
+        return explainer.explain_instance(
+            features,
+            predict_fn,
+            num_features=num_feats,
+            labels=(1,),
+            num_samples=num_samples,
+        )
+
+    explainer = get_prefix_explainer(explainer, features, num_samples)
+    predict_fn = get_prefix_predictor(predict_fn)
+    budget = min_samples
+    exp = explainer.explain_instance(
+        features,
+        predict_fn,
+        num_features=num_feats,
+        labels=(1,),
+        num_samples=budget,
     )
-    return explainer
+    while budget < num_samples:
+        budget = min(2 * budget, num_samples)
+        next_exp = explainer.explain_instance(
+            features,
+            predict_fn,
+            num_features=num_feats,
+            labels=(1,),
+            num_samples=budget,
+        )
+        is_stable = (
+            get_top_features(next_exp)[:top_k] == get_top_features(exp)[:top_k]
+        )
+        exp = next_exp
+        if is_stable:
+            break
+    return exp
 
 
-EXPLAINER = get_explainer()
+def predict_stacked(predict_fn, matrices):
+    """
+    Predict several perturbation matrices with a single call to the model,
+    which costs less than one call per matrix, above all for small matrices
+    
+    Parameters
+    ----------
+    predict_fn : callable
+        Returns the probabilities of each class for an array of features
+    matrices : list of arrays
+        Perturbations of different questions, with the same columns
+
+    Returns
+    -------
+        List of arrays of probabilities, one per matrix
+    """
+    sizes = [len(matrix) for matrix in matrices]
+    probs = predict_fn(np.vstack(matrices))
+    return np.split(probs, np.cumsum(sizes)[:-1])
 
 
 def simplify_order_sign(order_sign):
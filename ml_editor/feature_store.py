@@ -0,0 +1,102 @@
+import numpy as np
+import pandas as pd
+from scipy.sparse import csr_matrix
+
+from ml_editor.data_processing import transform_in_parallel
+
+
+class FeatureStore:
+    """
+    Holds the text vectors of a DataFrame as a single CSR matrix, whose rows
+    are aligned to the index of the DataFrame. Rows are selected with index
+    arrays, so vectors of a train or test split are gathered in one
+    operation instead of being stored and stacked one row at a time.
+
+    Parameters
+    ----------
+    vectors : sparse matrix
+        One row of vectors per question
+    index : Pandas Index
+        Unique labels of the questions, in the order of the rows
+    """
+
+    def __init__(self, vectors, index):
+        if vectors.shape[0] != len(index):
+            raise ValueError(
+                "Got {} rows of vectors for an index of length {}".format(
+                    vectors.shape[0], len(index)
+                )
+            )
+        if not index.is_unique:
+            raise ValueError("The index of a feature store must be unique")
+        self.vectors = csr_matrix(vectors)
+        self.index = pd.Index(index)
+
+    @classmethod
+    def from_texts(cls, text_series, vectorizer, executor=None):
+        """
+        Vectorize a series of text with a pre-trained vectorizer
+
+        Parameters
+        ----------
+        text_series : Pandas Series of text
+            Questions, indexed like the DataFrame they belong to
+        vectorizer : pretrained sklearn vectorizer
+        executor : ProcessPoolExecutor, optional
+            Pool returned by data_processing.get_transform_executor, to
+            vectorize questions in parallel, by default None
+
+        Returns
+        -------
+            FeatureStore aligned to the index of text_series
+        """
+        vectors = transform_in_parallel(
+            vectorizer, text_series, executor=executor
+        )
+        return cls(vectors, text_series.index)
+
+    def __len__(self):
+        return self.vectors.shape[0]
+
+    def get_positions(self, index):
+        """
+        Row positions of the given labels
+
+        Parameters
+        ----------
+        index : array-like
+            Labels of the questions to select
+
+        Returns
+        -------
+            Array of row positions
+        """
+        positions = self.index.get_indexer(index)
+        if (positions < 0).any():
+            missing = np.asarray(index)[positions < 0]
+            raise KeyError(
+                "Labels missing from the feature store: {}".format(
+                    list(missing[:5])
+                )
+            )
+        return positions
+
+    def get_rows(self, index):
+        """
+        Vectors of the given questions, in the order of the labels
+
+        Parameters
+        ----------
+        index : array-like
+            Labels of the questions to select, such as the index of a split
+
+        Returns
+        -------
+            CSR matrix with one row per label
+        """
+        positions = self.get_positions(index)
+        if len(positions) == len(self) and (
+            positions == np.arange(len(self))
+        ).all():
+            return self.vectors
+        return self.vectors[positions]
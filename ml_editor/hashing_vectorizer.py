@@ -0,0 +1,131 @@
+import numpy as np
+from scipy.sparse import diags
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.preprocessing import normalize
+
+
+class StreamingTfidfVectorizer:
+    """
+    TF-IDF vectorizer hashing words to columns instead of keeping a
+    vocabulary. Document frequencies are counted chunk by chunk with
+    partial_fit, so it can be fitted on corpora that do not fit in memory,
+    and the fitted vectorizer only stores one count per column.
+
+    Columns follow the defaults of sklearn's TfidfTransformer: smoothed idf
+    and l2 normalized rows. As in train_vectorizer, columns of words present
+    in fewer than min_df documents or in more than a max_df share of them
+    are dropped.
+
+    Parameters
+    ----------
+    n_features : int, optional
+        Number of columns words are hashed to, by default 2 ** 18
+    min_df : int, optional
+        Minimum number of documents containing a column, by default 5
+    max_df : float, optional
+        Maximum share of documents containing a column, by default 0.5
+    strip_accents : str, optional
+        Accent stripping of HashingVectorizer, by default 'ascii'
+    """
+
+    def __init__(
+        self, n_features=2 ** 18, min_df=5, max_df=0.5, strip_accents="ascii"
+    ):
+        self.n_features = n_features
+        self.min_df = min_df
+        self.max_df = max_df
+        self.strip_accents = strip_accents
+        self.n_docs = 0
+        self.doc_counts = np.zeros(n_features, dtype=np.int64)
+        self._idf = None
+
+    def get_hasher(self):
+        """
+        Stateless vectorizer producing raw counts of hashed words
+        """
+        return HashingVectorizer(
+            n_features=self.n_features,
+            strip_accents=self.strip_accents,
+            alternate_sign=False,
+            norm=None,
+        )
+
+    def partial_fit(self, texts):
+        """
+        Count the documents containing each column in a chunk of texts
+
+        Parameters
+        ----------
+        texts : iterable of str
+            Chunk of questions
+
+        Returns
+        -------
+            The vectorizer
+        """
+        counts = self.get_hasher().transform(texts).tocsr()
+        self.doc_counts += np.bincount(
+            counts.indices, minlength=self.n_features
+        )
+        self.n_docs += counts.shape[0]
+        self._idf = None
+        return self
+
+    def fit(self, text_chunks):
+        """
+        Count document frequencies over every chunk of a corpus, forgetting
+        previous counts
+
+        Parameters
+        ----------
+        text_chunks : iterable of iterables of str
+            Chunks of questions, such as the text of the DataFrames yielded
+            by data_ingestion.iter_posts_from_xml
+
+        Returns
+        -------
+            The vectorizer
+        """
+        self.n_docs = 0
+        self.doc_counts = np.zeros(self.n_features, dtype=np.int64)
+        for texts in text_chunks:
+            self.partial_fit(texts)
+        return self
+
+    @property
+    def idf(self):
+        """
+        Inverse document frequency of each column, zero for dropped columns
+        """
+        if self._idf is None:
+            if self.n_docs == 0:
+                raise ValueError("The vectorizer has not been fitted")
+            idf = np.log((1 + self.n_docs) / (1 + self.doc_counts)) + 1
+            kept = (self.doc_counts >= self.min_df) & (
+                self.doc_counts <= self.max_df * self.n_docs
+            )
+            self._idf = np.where(kept, idf, 0)
+        return self._idf
+
+    def transform(self, texts):
+        """
+        Vectorize texts
+
+        Parameters
+        ----------
+        texts : iterable of str
+            Questions to vectorize
+
+        Returns
+        -------
+            CSR matrix of shape (number of texts, n_features)
+        """
+        counts = self.get_hasher().transform(texts)
+        vectors = counts.tocsr() @ diags(self.idf)
+        vectors.eliminate_zeros()
+        return normalize(vectors)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_idf"] = None
+        return state
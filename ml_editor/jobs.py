@@ -0,0 +1,143 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class JobQueueFull(Exception):
+    """
+    Raised when a job is submitted while the maximum number of jobs are
+    already waiting or running
+    """
+
+
+class BackgroundJobs:
+    """
+    Runs slow jobs, such as explanations, on a bounded pool of threads and
+    keeps their futures so that later requests can look them up by id.
+    At most max_pending jobs wait or run at once, submitting more raises
+    JobQueueFull instead of growing the queue without bound. Each
+    submission of a job subscribes to it, and a job which has not started
+    is cancelled once every subscriber released it. Finished jobs are
+    forgotten after ttl seconds.
+
+    Parameters
+    ----------
+    max_workers : int, optional
+        Number of threads running jobs, by default 2
+    max_pending : int, optional
+        Largest number of jobs waiting or running, by default 32
+    ttl : float, optional
+        Seconds finished jobs are kept for, by default 300
+    """
+
+    def __init__(self, max_workers=2, max_pending=32, ttl=300):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._jobs = {}
+        self._subscribers = {}
+        self._finished = {}
+        self._executor = None
+        self._pid = None
+
+    def submit(self, job_id, fn, *args, **kwargs):
+        """
+        Subscribe to a job, starting it unless a job with the same id is
+        already waiting or running
+
+        Parameters
+        ----------
+        job_id : str
+            Identifier of the job, e.g. the hash of its input
+        fn : callable
+            Function run by the job
+
+        Returns
+        -------
+            Future holding the result of the job
+        """
+        with self._lock:
+            executor = self._get_executor()
+            self._forget_expired()
+            future = self._jobs.get(job_id)
+            if future is not None and not future.done():
+                self._subscribers[job_id] += 1
+                return future
+            if self.num_pending() >= self.max_pending:
+                raise JobQueueFull(
+                    "{} jobs are already pending".format(self.max_pending)
+                )
+            future = executor.submit(fn, *args, **kwargs)
+            self._jobs[job_id] = future
+            self._subscribers[job_id] = 1
+            self._finished.pop(job_id, None)
+        future.add_done_callback(lambda f: self._set_finished(job_id, f))
+        return future
+
+    def get(self, job_id):
+        """
+        Future of a job, or None if the job is unknown to this process
+        """
+        with self._lock:
+            self._forget_expired()
+            return self._jobs.get(job_id)
+
+    def release(self, job_id):
+        """
+        Unsubscribe from a job, cancelling it if it has not started and
+        was released by every subscriber
+
+        Returns
+        -------
+            True if the job was cancelled
+        """
+        with self._lock:
+            future = self._jobs.get(job_id)
+            if future is None or future.done():
+                return False
+            self._subscribers[job_id] -= 1
+            if self._subscribers[job_id] > 0:
+                return False
+        # Callbacks of a cancelled future run at once, and take the lock
+        if not future.cancel():
+            return False
+        with self._lock:
+            if self._jobs.get(job_id) is future:
+                del self._jobs[job_id]
+                del self._subscribers[job_id]
+                self._finished.pop(job_id, None)
+        return True
+
+    def num_pending(self):
+        """
+        Number of jobs waiting or running
+        """
+        return sum(not future.done() for future in self._jobs.values())
+
+    def _set_finished(self, job_id, future):
+        with self._lock:
+            if self._jobs.get(job_id) is future:
+                self._finished[job_id] = time.monotonic()
+
+    def _forget_expired(self):
+        now = time.monotonic()
+        for job_id, finished in list(self._finished.items()):
+            if now - finished > self.ttl:
+                self._jobs.pop(job_id, None)
+                self._subscribers.pop(job_id, None)
+                del self._finished[job_id]
+
+    def _get_executor(self):
+        """
+        Return the thread pool, creating it on first use. Threads do not
+        survive a fork, so a forked server worker creates its own.
+        """
+        if self._pid != os.getpid():
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers)
+            self._jobs = {}
+            self._subscribers = {}
+            self._finished = {}
+            self._pid = os.getpid()
+        return self._executor
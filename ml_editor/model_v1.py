@@ -2,10 +2,14 @@ import os
 from pathlib import Path
 
 import pandas as pd
-import joblib
-from scipy.sparse import vstack, hstack
+from scipy.sparse import hstack
 
-from ml_editor.data_processing import add_v1_features
+from ml_editor.data_processing import (
+    add_v1_features,
+    get_transform_executor,
+    transform_in_parallel,
+)
+from ml_editor.resources import LazyResource, load_artifact, TRANSFORM_WORKERS
 
 FEATURE_ARR = [
     "action_verb_full",
@@ -20,8 +24,21 @@ print(curr_path)
 model_path = Path('../models/model_1.pkl')
 vectorizer_path = Path('../models/vectorizer_1.pkl')
 
-VECTORIZER = joblib.load(curr_path / vectorizer_path)
-MODEL = joblib.load(curr_path / model_path)
+# Artifacts are loaded on first use, call warm_up to load them ahead of time
+VECTORIZER = LazyResource(lambda: load_artifact(curr_path / vectorizer_path))
+MODEL = LazyResource(lambda: load_artifact(curr_path / model_path))
+TRANSFORM_EXECUTOR = LazyResource(
+    lambda: get_transform_executor(VECTORIZER.get(), TRANSFORM_WORKERS)
+)
+ARTIFACT_PATHS = [curr_path / model_path, curr_path / vectorizer_path]
+
+
+def warm_up():
+    """
+    Load the vectorizer and model of the v1 model
+    """
+    VECTORIZER.get()
+    MODEL.get()
 
 
 def get_model_probabilities_for_input_texts(text_array):
@@ -39,14 +56,14 @@ def get_model_probabilities_for_input_texts(text_array):
     array of predicted probabilities
         [[prob_low_score_1, prob_high_score_1],...]
     """
-    global FEATURE_ARR, VECTORIZER, MODEL
-    vectors = VECTORIZER.transform(text_array)
+    vectors = transform_in_parallel(
+        VECTORIZER.get(), text_array, executor=TRANSFORM_EXECUTOR.get()
+    )
     text_ser = pd.DataFrame(text_array, columns=['full_text'])
     text_ser = add_v1_features(text_ser)
-    vec_features = vstack(vectors)
     num_features = text_ser[FEATURE_ARR].astype(float)
-    features = hstack([vec_features, num_features])
-    return MODEL.predict_proba(features)
+    features = hstack([vectors, num_features])
+    return MODEL.get().predict_proba(features)
 
 def get_model_predictions_for_input_texts(text_array):
     """
@@ -1,15 +1,18 @@
 import os
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
-import spacy
-import joblib
 from tqdm import tqdm
+import numpy as np
 import pandas as pd 
-import nltk
-from scipy.sparse import vstack, hstack
+from scipy.sparse import hstack
 
-nltk.download("vader_lexicon")
-from nltk.sentiment.vader import SentimentIntensityAnalyzer
+from ml_editor.data_processing import (
+    get_transform_executor,
+    transform_in_parallel,
+)
+from ml_editor.resources import LazyResource, load_artifact, TRANSFORM_WORKERS
+from ml_editor.result_cache import MemoryResultCache
 
 POS_NAMES = {
     "ADJ": "adjective",
@@ -48,88 +51,204 @@ FEATURE_ARR = [
 ]
 FEATURE_ARR.extend(POS_NAMES.keys())
 
-SPACY_MODEL = spacy.load("en_core_web_md")
-tqdm.pandas()
+# Features computed from spaCy docs by get_doc_features, in column order
+WORD_STAT_NAMES = ["num_words", "num_diff_words", "avg_word_len", "num_stops"]
+DOC_FEATURE_NAMES = WORD_STAT_NAMES + list(POS_NAMES.keys())
+POS_INDEX = {pos_name: i for i, pos_name in enumerate(POS_NAMES.keys())}
+
+# Punctuation characters counted by add_char_count_features
+CHAR_COUNT_FEATURES = {
+    "num_questions": "?",
+    "num_periods": ".",
+    "num_commas": ",",
+    "num_exclam": "!",
+    "num_quotes": '"',
+    "num_colon": ":",
+    "num_semicolon": ";",
+}
+
+# Features only read the text, part of speech and stop word flag of tokens
+UNUSED_SPACY_PIPES = ["parser", "ner"]
 
 curr_path = Path(os.path.dirname(__file__))
 
 model_path = Path('../models/model_2.pkl')
 vectorizer_path = Path("../models/vectorizer_2.pkl")
-VECTORIZER = joblib.load(curr_path / vectorizer_path)
-MODEL = joblib.load(curr_path / model_path)
 
 
-def count_each_pos(df):
+def load_spacy_model():
+    """
+    Load the spaCy model used to generate word features, without the
+    components that features do not use. spaCy is imported here since
+    importing it is slow.
+    """
+    import spacy
+
+    return spacy.load("en_core_web_md", disable=UNUSED_SPACY_PIPES)
+
+
+def load_sentiment_analyzer():
+    """
+    Create the VADER analyzer used for sentiment scores, downloading its
+    lexicon if missing. nltk is imported here since importing it is slow.
+    """
+    import nltk
+    from nltk.sentiment.vader import SentimentIntensityAnalyzer
+
+    try:
+        nltk.data.find("sentiment/vader_lexicon.zip")
+    except LookupError:
+        nltk.download("vader_lexicon")
+    return SentimentIntensityAnalyzer()
+
+
+# Resources are loaded on first use, call warm_up to load them ahead of time
+SPACY_MODEL = LazyResource(load_spacy_model)
+SENTIMENT_ANALYZER = LazyResource(load_sentiment_analyzer)
+VECTORIZER = LazyResource(lambda: load_artifact(curr_path / vectorizer_path))
+MODEL = LazyResource(lambda: load_artifact(curr_path / model_path))
+TRANSFORM_EXECUTOR = LazyResource(
+    lambda: get_transform_executor(VECTORIZER.get(), TRANSFORM_WORKERS)
+)
+ARTIFACT_PATHS = [curr_path / model_path, curr_path / vectorizer_path]
+
+# Polarity of recently scored questions, keyed by the hash of their text.
+# Entries take about 400 bytes each, so the cache holds about 40k scores
+# and uses up to 16MB per process
+POLARITY_CACHE = MemoryResultCache(max_bytes=16 * 1024 * 1024)
+
+
+def warm_up_features():
+    """
+    Load the resources needed to generate v2 text features
+    """
+    SPACY_MODEL.get()
+    SENTIMENT_ANALYZER.get()
+
+
+def warm_up():
+    """
+    Load every resource of the v2 model
+    """
+    warm_up_features()
+    VECTORIZER.get()
+    MODEL.get()
+
+
+def get_word_stats(df, batch_size=64, n_process=1):
     """
-    Count occurrences of each part of speech, and add it to an input DataFrame.
+    Adds statistical features such as word counts to a DataFrame, in place.
+    Docs are reduced to their features as spaCy yields them, so they are
+    never all held in memory at once.
     
     Parameters
     ----------
-    df : Pandas DataFrame
-        Input DataFrame containing text that has been passed to SPACY_MODEL
+    df : DataFrame
+        Containing full_text column with training questions.
+    batch_size : int, optional
+        Number of questions spaCy processes at once, by default 64
+    n_process : int, optional
+        Number of processes parsing questions, by default 1
+
     Returns
     -------
-        DataFrame with occurrence counts
-    """
-    global POS_NAMES
-    pos_list = df["spacy_text"].apply(lambda doc: [token.pos_ for token in doc])
-    for pos_name in POS_NAMES.keys():
-        df[pos_name] = (
-            pos_list.apply(
-                lambda x: len([match for match in x if match == pos_name])
-            )
-            / df["num_chars"]
-        )
+        DataFrame with new feature columns
+    """
+    docs = SPACY_MODEL.get().pipe(
+        df['full_text'], batch_size=batch_size, n_process=n_process
+    )
+    features = get_doc_features(tqdm(docs, total=len(df)), df['num_chars'])
+    for i, feature_name in enumerate(DOC_FEATURE_NAMES):
+        df[feature_name] = features[:, i]
     return df
 
 
-def get_word_stats(df):
+def get_doc_features(docs, num_chars):
     """
-    Adds statistical features such as word counts to a DataFrame
+    Computes word statistics and the frequency of each part of speech for
+    spaCy docs, walking each doc only once. Columns follow DOC_FEATURE_NAMES.
     
     Parameters
     ----------
-    df : DataFrame
-        Containing full_text column with training questions.
+    docs : iterable of spaCy Doc
+        Docs of the questions
+    num_chars : array-like
+        Number of characters of each question
 
     Returns
     -------
-        DataFrame with new feature columns
+        Array of shape (number of docs, len(DOC_FEATURE_NAMES))
     """
-    global SPACY_MODEL
-    df['spacy_text'] = df['full_text'].progress_apply(
-        lambda x: SPACY_MODEL(x))
-
-    df['num_words'] = (
-        df["spacy_text"].apply(lambda x: 100 * len(x)) / df["num_chars"]
-    )
-    df["num_diff_words"] = df["spacy_text"].apply(lambda x: len(set(x)))
-    df["avg_word_len"] = df["spacy_text"].apply(lambda x: get_avg_word_len(x))
-
-    df["num_stops"] = (
-        df["spacy_text"].apply(
-            lambda x: 100*len([stop for stop in x if stop.is_stop])
+    num_chars = np.asarray(num_chars, dtype=float)
+    features = np.zeros((len(num_chars), len(DOC_FEATURE_NAMES)))
+    pos_start = len(WORD_STAT_NAMES)
+
+    for row, doc in enumerate(docs):
+        num_words = 0
+        total_word_len = 0
+        num_stops = 0
+        pos_counts = [0] * len(POS_INDEX)
+        for token in doc:
+            num_words += 1
+            total_word_len += len(token)
+            num_stops += token.is_stop
+            pos_index = POS_INDEX.get(token.pos_)
+            if pos_index is not None:
+                pos_counts[pos_index] += 1
+        # Tokens hash by their position in the doc, so every token of a doc
+        # is a different word for num_diff_words
+        features[row, :pos_start] = (
+            num_words,
+            num_words,
+            total_word_len / num_words if num_words else 0,
+            num_stops,
         )
-        / df["num_chars"]
-    )
+        features[row, pos_start:] = pos_counts
 
-    df = count_each_pos(df.copy())
-    return df
+    # Scale counts by the length of the question, like the other features
+    with np.errstate(divide="ignore", invalid="ignore"):
+        features[:, 0] = 100 * features[:, 0] / num_chars
+        features[:, 3] = 100 * features[:, 3] / num_chars
+        features[:, pos_start:] /= num_chars[:, np.newaxis]
+    return features
 
 
-def get_avg_word_len(tokens):
+def count_chars(texts, chars):
     """
-    Returns average word length for a list of words
+    Counts occurrences of each of several ASCII characters in texts, in a
+    single scan of each text. Every other byte is deleted from the utf-8
+    encoding of texts, and the few remaining bytes are counted together.
+    Multi-byte utf-8 sequences never contain ASCII bytes, so byte counts are
+    character counts.
     
     Parameters
     ----------
-    tokens : array-like
-        List of words
+    texts : array-like of str
+        Texts to count characters in
+    chars : list of str
+        ASCII characters to count
+
+    Returns
+    -------
+        Contiguous float array of shape (number of texts, len(chars))
     """
-    if len(tokens) < 1:
-        return 0
-    lens = [len(x) for x in tokens]
-    return float(sum(lens) / len(lens))
+    char_bytes = bytes(ord(char) for char in chars)
+    other_bytes = bytes(
+        byte for byte in range(256) if byte not in set(char_bytes)
+    )
+    byte_columns = np.zeros(256, dtype=np.int64)
+    byte_columns[list(char_bytes)] = np.arange(len(chars))
+
+    kept = [
+        text.encode("utf-8").translate(None, other_bytes) for text in texts
+    ]
+    num_kept = np.fromiter(map(len, kept), dtype=np.int64, count=len(kept))
+    rows = np.repeat(np.arange(len(kept)), num_kept)
+    columns = byte_columns[np.frombuffer(b"".join(kept), dtype=np.uint8)]
+    counts = np.bincount(
+        rows * len(chars) + columns, minlength=len(kept) * len(chars)
+    )
+    return counts.reshape(len(kept), len(chars)).astype(float)
 
 
 def add_char_count_features(df):
@@ -147,17 +266,72 @@ def add_char_count_features(df):
     """
     df["num_chars"] = df["full_text"].str.len()
 
-    df["num_questions"] = 100 * df["full_text"].str.count("\?") / df["num_chars"]
-    df["num_periods"] = 100 * df["full_text"].str.count("\.") / df["num_chars"]
-    df["num_commas"] = 100 * df["full_text"].str.count(",") / df["num_chars"]
-    df["num_exclam"] = 100 * df["full_text"].str.count("!") / df["num_chars"]
-    df["num_quotes"] = 100 * df["full_text"].str.count('"') / df["num_chars"]
-    df["num_colon"] = 100 * df["full_text"].str.count(":") / df["num_chars"]
-    df["num_semicolon"] = 100 * df["full_text"].str.count(";") / df["num_chars"]
+    counts = count_chars(
+        df["full_text"].fillna(""), list(CHAR_COUNT_FEATURES.values())
+    )
+    num_chars = df["num_chars"].values.astype(float)[:, np.newaxis]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        counts = 100 * counts / num_chars
+    for i, feature_name in enumerate(CHAR_COUNT_FEATURES.keys()):
+        df[feature_name] = counts[:, i]
     return df
 
 
-def get_sentiment_score(df):
+def get_polarity(text):
+    """
+    Share of the words of a question that VADER considers positive
+    
+    Parameters
+    ----------
+    text : str
+        Input question
+
+    Returns
+    -------
+        Positive polarity score
+    """
+    return SENTIMENT_ANALYZER.get().polarity_scores(text)["pos"]
+
+
+def get_polarity_scores(texts, n_process=1, chunksize=256):
+    """
+    Positive polarity scores of questions. Scores of questions seen recently
+    come from POLARITY_CACHE, the others are computed, optionally across a
+    process pool, and cached.
+    
+    Parameters
+    ----------
+    texts : list of str
+        Input questions
+    n_process : int, optional
+        Number of processes scoring questions, by default 1
+    chunksize : int, optional
+        Number of questions sent to a process at once, by default 256
+
+    Returns
+    -------
+        List of scores, in the order of texts
+    """
+    scores = [POLARITY_CACHE.get("polarity", text) for text in texts]
+    missing = [i for i, score in enumerate(scores) if score is None]
+    missing_texts = [texts[i] for i in missing]
+
+    if n_process > 1 and len(missing) > chunksize:
+        with ProcessPoolExecutor(max_workers=n_process) as executor:
+            computed = executor.map(
+                get_polarity, missing_texts, chunksize=chunksize
+            )
+            computed = list(tqdm(computed, total=len(missing)))
+    else:
+        computed = [get_polarity(text) for text in tqdm(missing_texts)]
+
+    for i, text, score in zip(missing, missing_texts, computed):
+        POLARITY_CACHE.set("polarity", text, score)
+        scores[i] = score
+    return scores
+
+
+def get_sentiment_score(df, n_process=1):
     """
     Uses nltk to return a polarity score for an input question
     
@@ -165,34 +339,39 @@ def get_sentiment_score(df):
     ----------
     df : DataFrame
         Contains a full_text column with training questions.
+    n_process : int, optional
+        Number of processes scoring questions, by default 1
 
     Returns
     ------
         DataFrame with a polarity column.
     """
-    sid = SentimentIntensityAnalyzer()
-    df["polarity"] = df["full_text"].progress_apply(
-        lambda x: sid.polarity_scores(x)["pos"]
+    df["polarity"] = get_polarity_scores(
+        df["full_text"].tolist(), n_process=n_process
     )
     return df
 
 
-def add_v2_text_features(df):
+def add_v2_text_features(df, batch_size=64, n_process=1):
     """
-    Adds multiple features used by the v2 model to a DataFrame.
+    Adds multiple features used by the v2 model to a DataFrame, in place.
     
     Parameters
     ----------
     df : DataFrame
         Containing a full_text column with training questions.
+    batch_size : int, optional
+        Number of questions spaCy processes at once, by default 64
+    n_process : int, optional
+        Number of processes parsing and scoring questions, by default 1
 
     Returns
     -------
         DataFrame with feature columns added
     """
-    df = add_char_count_features(df.copy())
-    df = get_word_stats(df.copy())
-    df = get_sentiment_score(df.copy())
+    df = add_char_count_features(df)
+    df = get_word_stats(df, batch_size=batch_size, n_process=n_process)
+    df = get_sentiment_score(df, n_process=n_process)
     return df
 
 
@@ -211,14 +390,14 @@ def get_model_probabilities_for_input_texts(text_array):
     -------
         array of predicted probabilities
     """
-    global FEATURE_ARR, VECTORIZER, MODEL
-    vectors = VECTORIZER.transform(text_array)
+    vectors = transform_in_parallel(
+        VECTORIZER.get(), text_array, executor=TRANSFORM_EXECUTOR.get()
+    )
     text_ser = pd.DataFrame(text_array, columns=["full_text"])
-    text_ser = add_v2_text_features(text_ser.copy())
-    vec_features = vstack(vectors)
+    text_ser = add_v2_text_features(text_ser)
     num_features = text_ser[FEATURE_ARR].astype(float)
-    features = hstack([vec_features, num_features])
-    return MODEL.predict_proba(features)
+    features = hstack([vectors, num_features])
+    return MODEL.get().predict_proba(features)
 
 
 def get_question_score_from_input(text):
@@ -254,6 +433,40 @@ def get_pos_score_from_text(input_text):
         Estimated probability of question receiving a high score
     """
     positive_proba = get_question_score_from_input(input_text)
+    return format_pos_score(positive_proba)
+
+
+def get_pos_scores_from_texts(text_array):
+    """
+    Get scores that can be displayed in the Flask app for several questions,
+    using a single call to the model
+    
+    Parameters
+    ----------
+    text_array : array-like
+        Array of questions to be scored
+    
+    Returns
+    -------
+        List of displayable scores, in the same order as the questions
+    """
+    preds = get_model_probabilities_for_input_texts(text_array)
+    return [format_pos_score(positive_proba) for positive_proba in preds[:, 1]]
+
+
+def format_pos_score(positive_proba):
+    """
+    Format a probability to be displayed in the Flask app
+    
+    Parameters
+    ----------
+    positive_proba : float
+        Estimated probability of question receiving a high score
+    
+    Returns
+    -------
+        HTML displayable score
+    """
     output_str = (
         """
         Question score (0 is worst, 1 is best):
@@ -261,4 +474,4 @@ def get_pos_score_from_text(input_text):
         {}
         """.format(positive_proba)
     )
-    return output_str
\ No newline at end of file
+    return output_str
@@ -1,29 +1,128 @@
 import os
 from pathlib import Path
 
-import spacy
-import joblib
-from tqdm import tqdm
 import pandas as pd 
-import nltk
 
 from ml_editor.explanation_generation import (
+    explain_features,
+    explain_features_from_table,
+    explanation_table_path,
+    predict_stacked,
     parse_explanations,
     get_recommendation_string_from_parsed_exps,
     EXPLAINER,
+    EXPLANATION_TABLE,
     FEATURE_ARR,
 )
-from ml_editor.model_v2 import add_v2_text_features
-
-nltk.download("vader_lexicon")
-
-SPACY_MODEL = spacy.load("en_core_web_md")
-tqdm.pandas()
+from ml_editor.batching import RequestCoalescer
+from ml_editor.model_v2 import add_v2_text_features, warm_up_features
+from ml_editor.resources import LazyResource, load_artifact
 
 curr_path = Path(os.path.dirname(__file__))
 
 model_path = Path('../models/model_3.pkl')
-MODEL = joblib.load(curr_path / model_path)
+# The model is loaded on first use, call warm_up to load it ahead of time
+MODEL = LazyResource(lambda: load_artifact(curr_path / model_path))
+ARTIFACT_PATHS = [curr_path / model_path]
+
+# Perturbation budgets of LIME explanations. "full" uses LIME's default of
+# 5000 perturbations, which takes seconds per question on the v3 model.
+# "fast" draws ML_EDITOR_LIME_SAMPLES perturbations. "adaptive" starts from
+# 125 perturbations and doubles them, up to 1000, until the ranking of the
+# top features stops changing
+EXPLANATION_MODES = {
+    "fast": {
+        "num_samples": int(os.environ.get("ML_EDITOR_LIME_SAMPLES", 250)),
+        "min_samples": None,
+    },
+    "adaptive": {"num_samples": 1000, "min_samples": 125},
+    "full": {"num_samples": 5000, "min_samples": None},
+}
+# Explanations looked up in the table of global explanations precomputed by
+# build_explanation_artifacts.py, without calling the model
+SURROGATE_MODE = "surrogate"
+# LIME mode used instead of SURROGATE_MODE when the table has not been built
+FALLBACK_EXPLANATION_MODE = "fast"
+# Mode used when a request does not pick one: the precomputed table when it
+# has been built, fast LIME otherwise
+DEFAULT_EXPLANATION_MODE = os.environ.get(
+    "ML_EDITOR_EXPLANATION_MODE",
+    SURROGATE_MODE
+    if (curr_path / explanation_table_path).exists()
+    else FALLBACK_EXPLANATION_MODE,
+)
+EXPLANATION_MODE_NAMES = [SURROGATE_MODE] + list(EXPLANATION_MODES)
+if DEFAULT_EXPLANATION_MODE not in EXPLANATION_MODE_NAMES:
+    raise ValueError(
+        "Unknown ML_EDITOR_EXPLANATION_MODE {}, expected one of {}".format(
+            DEFAULT_EXPLANATION_MODE, EXPLANATION_MODE_NAMES
+        )
+    )
+SURROGATE_ARTIFACT_PATHS = ARTIFACT_PATHS + [
+    curr_path / explanation_table_path
+]
+# Seed of LIME perturbations, set it to get reproducible explanations
+EXPLANATION_SEED = os.environ.get("ML_EDITOR_LIME_SEED")
+if EXPLANATION_SEED is not None:
+    EXPLANATION_SEED = int(EXPLANATION_SEED)
+
+# LIME scores thousands of perturbations of each question it explains. The
+# perturbations of questions explained at the same time, by up to
+# PERTURBATION_BATCH_SIZE threads, are scored together with a single call to
+# the model
+PERTURBATION_BATCH_SIZE = 8
+PERTURBATION_SCORER = RequestCoalescer(
+    lambda matrices: predict_stacked(MODEL.get().predict_proba, matrices),
+    max_batch_size=PERTURBATION_BATCH_SIZE,
+    max_wait=0.002,
+)
+
+
+def warm_up():
+    """
+    Load every resource of the v3 model, including the explainer
+    """
+    warm_up_features()
+    MODEL.get()
+    EXPLAINER.get()
+    if get_explanation_mode() == SURROGATE_MODE:
+        EXPLANATION_TABLE.get()
+
+
+def get_explanation_mode(mode=None):
+    """
+    Check the explanation mode picked by a request
+    
+    Parameters
+    ----------
+    mode : str, optional
+        SURROGATE_MODE or a key of EXPLANATION_MODES, by default
+        DEFAULT_EXPLANATION_MODE, or FALLBACK_EXPLANATION_MODE if the
+        default is SURROGATE_MODE and the table has not been built
+
+    Returns
+    -------
+        Name of the explanation mode to use
+
+    Raises
+    ------
+    ValueError
+        For unknown modes, and for SURROGATE_MODE when the table of
+        explanations has not been built
+    """
+    table_exists = (curr_path / explanation_table_path).exists()
+    if not mode:
+        if DEFAULT_EXPLANATION_MODE == SURROGATE_MODE and not table_exists:
+            return FALLBACK_EXPLANATION_MODE
+        return DEFAULT_EXPLANATION_MODE
+    if mode not in EXPLANATION_MODE_NAMES:
+        raise ValueError("Unknown explanation mode: {}".format(mode))
+    if mode == SURROGATE_MODE and not table_exists:
+        raise ValueError(
+            "The explanation table has not been built, run "
+            "build_explanation_artifacts.py"
+        )
+    return mode
 
 
 def get_features_from_input_text(text_input):
@@ -56,7 +155,7 @@ def get_features_from_text_array(input_array):
         DataFrame of features
     """
     text_ser = pd.DataFrame(input_array, columns=['full_text'])
-    text_ser = add_v2_text_features(text_ser.copy())
+    text_ser = add_v2_text_features(text_ser)
     features = text_ser[FEATURE_ARR].astype(float)
     return features
 
@@ -74,9 +173,8 @@ def get_model_probabilities_for_input_texts(text_array):
     -------
         Array of predictions
     """
-    global MODEL
     features = get_features_from_text_array(text_array)
-    return MODEL.predict_proba(features)
+    return MODEL.get().predict_proba(features)
 
 
 def get_question_score_from_input(text):
@@ -97,7 +195,9 @@ def get_question_score_from_input(text):
     return positive_proba
 
 
-def get_recommendation_and_prediction_from_text(input_text, num_feats=10):
+def get_recommendation_and_prediction_from_text(
+    input_text, num_feats=10, mode=None, random_state=EXPLANATION_SEED
+):
     """
     Gets a score and recommendations that can be displayed in the Flask app
     
@@ -107,22 +207,129 @@ def get_recommendation_and_prediction_from_text(input_text, num_feats=10):
         Input string
     num_feats : int, optional
         Number of features to suggest recommendations for, by default 10
+    mode : str, optional
+        SURROGATE_MODE or a key of EXPLANATION_MODES, by default
+        DEFAULT_EXPLANATION_MODE
+    random_state : int, optional
+        Seed of LIME perturbations, by default EXPLANATION_SEED
 
     Returns
     -------
         Current score along with recommendations
     """
-    global MODEL
-    feats = get_features_from_input_text(input_text)
+    return get_recommendations_and_predictions_from_texts(
+        [input_text], num_feats=num_feats, mode=mode, random_state=random_state
+    )[0]
 
-    pos_score = MODEL.predict_proba([feats])[0][1]
-    print('explaining...')
-    exp = EXPLAINER.explain_instance(
-        feats, MODEL.predict_proba, num_features=num_feats, labels=(1,)
-    )
-    print('explaning done')
-    parsed_exps = parse_explanations(exp.as_list())
-    recs = get_recommendation_string_from_parsed_exps(parsed_exps)
+
+def get_recommendations_and_predictions_from_texts(
+    input_array, num_feats=10, mode=None, random_state=EXPLANATION_SEED
+):
+    """
+    Gets scores and recommendations that can be displayed in the Flask app
+    for several questions. Features and scores are computed for all questions
+    at once, explanations are generated for each question.
+    
+    Parameters
+    ----------
+    input_array : array-like
+        array of input questions
+    num_feats : int, optional
+        Number of features to suggest recommendations for, by default 10
+    mode : str, optional
+        SURROGATE_MODE or a key of EXPLANATION_MODES, by default
+        DEFAULT_EXPLANATION_MODE
+    random_state : int, optional
+        Seed of LIME perturbations, by default EXPLANATION_SEED
+
+    Returns
+    -------
+        List of current scores along with recommendations, in the same order
+        as the questions
+    """
+    outputs = []
+    for pos_score, feats in get_scores_and_features_from_texts(input_array):
+        recs = get_recommendations_from_features(
+            feats, num_feats=num_feats, mode=mode, random_state=random_state
+        )
+        outputs.append(format_recommendation_and_prediction(pos_score, recs))
+    return outputs
+
+
+def get_scores_and_features_from_texts(input_array):
+    """
+    Scores several questions with a single call to the model, keeping the
+    features of each question so that it can be explained later
+    
+    Parameters
+    ----------
+    input_array : array-like
+        array of input questions
+
+    Returns
+    -------
+        List of (probability of a high score, array of features) pairs, in
+        the same order as the questions
+    """
+    features = get_features_from_text_array(input_array)
+    pos_scores = MODEL.get().predict_proba(features)[:, 1]
+    return list(zip(pos_scores, features.values))
+
+
+def get_recommendations_from_features(
+    feats, num_feats=10, mode=None, random_state=EXPLANATION_SEED
+):
+    """
+    Explains the score of a question, which takes much longer than scoring
+    it unless the precomputed table of explanations is used
+    
+    Parameters
+    ----------
+    feats : array-like
+        Features of the question, as returned by
+        get_scores_and_features_from_texts
+    num_feats : int, optional
+        Number of features to suggest recommendations for, by default 10
+    mode : str, optional
+        SURROGATE_MODE or a key of EXPLANATION_MODES, by default
+        DEFAULT_EXPLANATION_MODE
+    random_state : int, optional
+        Seed of LIME perturbations, by default EXPLANATION_SEED
+
+    Returns
+    -------
+        HTML displayable recommendations
+    """
+    mode = get_explanation_mode(mode)
+    if mode == SURROGATE_MODE:
+        exp_list = explain_features_from_table(feats, num_feats=num_feats)
+    else:
+        exp_list = explain_features(
+            feats,
+            PERTURBATION_SCORER,
+            num_feats=num_feats,
+            random_state=random_state,
+            **EXPLANATION_MODES[mode]
+        ).as_list()
+    parsed_exps = parse_explanations(exp_list)
+    return get_recommendation_string_from_parsed_exps(parsed_exps)
+
+
+def format_recommendation_and_prediction(pos_score, recs):
+    """
+    Format a score and recommendations to be displayed in the Flask app
+    
+    Parameters
+    ----------
+    pos_score : float
+        Estimated probability of question receiving a high score
+    recs : string
+        HTML displayable recommendations
+
+    Returns
+    -------
+        Current score along with recommendations
+    """
     output_str = """
     Current score (0 is worst, 1 is best):
      <br/>
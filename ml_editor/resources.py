@@ -0,0 +1,133 @@
+import os
+import threading
+
+import joblib
+
+# When set to 1, numpy arrays inside artifacts are memory-mapped read-only
+# instead of being copied in memory, so that processes loading the same
+# artifact share its pages. Artifacts must have been saved uncompressed.
+MMAP_ARTIFACTS = os.environ.get("ML_EDITOR_MMAP_ARTIFACTS") == "1"
+
+# Number of processes vectorizing large batches of questions. Pools are only
+# created when this is above 1
+TRANSFORM_WORKERS = int(os.environ.get("ML_EDITOR_TRANSFORM_WORKERS", "1"))
+
+
+# Signatures of the artifacts loaded by this process, as they were when
+# loaded. Cached results are keyed by these rather than by the files on
+# disk, which may have been replaced since without the models being reloaded
+_LOADED_SIGNATURES = {}
+
+
+def get_file_signature(path, info=None):
+    """
+    Summarize the state of a file, to detect when it changes
+
+    Parameters
+    ----------
+    path : Path
+        Path to the file
+    info : os.stat_result, optional
+        Status of the file, by default read from path
+
+    Returns
+    -------
+        String of the path, modification time and size
+    """
+    if info is None:
+        info = os.stat(path)
+    return "{}:{}:{}".format(path, info.st_mtime_ns, info.st_size)
+
+
+def record_artifact_signature(path, info=None):
+    """
+    Remember the state of an artifact this process loaded
+
+    Parameters
+    ----------
+    path : Path
+        Path to the artifact
+    info : os.stat_result, optional
+        Status of the file read before loading it, by default read from path
+    """
+    _LOADED_SIGNATURES[str(path)] = get_file_signature(path, info)
+
+
+def get_artifact_signature(path):
+    """
+    Signature of an artifact as this process loaded it, or of the file on
+    disk if it has not been loaded yet
+
+    Parameters
+    ----------
+    path : Path
+        Path to the artifact
+
+    Returns
+    -------
+        String of the path, modification time and size
+    """
+    signature = _LOADED_SIGNATURES.get(str(path))
+    if signature is None:
+        signature = get_file_signature(path)
+    return signature
+
+
+def load_artifact(path):
+    """
+    Load a model or vectorizer saved with joblib, recording its signature
+
+    Parameters
+    ----------
+    path : Path
+        Path to the artifact
+
+    Returns
+    -------
+        The loaded object
+    """
+    info = os.stat(path)
+    artifact = joblib.load(path, mmap_mode="r" if MMAP_ARTIFACTS else None)
+    record_artifact_signature(path, info)
+    return artifact
+
+
+class LazyResource:
+    """
+    Holds a resource, such as a model, that is only loaded the first time it
+    is used. Loading happens once even if several threads ask for the
+    resource at the same time.
+
+    Parameters
+    ----------
+    loader : callable
+        Function without arguments returning the resource
+    """
+
+    def __init__(self, loader):
+        self.loader = loader
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._resource = None
+
+    @property
+    def loaded(self):
+        """
+        Whether the resource has already been loaded
+        """
+        return self._loaded
+
+    def get(self):
+        """
+        Return the resource, loading it on first use
+
+        Returns
+        -------
+            The loaded resource
+        """
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    self._resource = self.loader()
+                    self._loaded = True
+        return self._resource
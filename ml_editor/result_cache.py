@@ -0,0 +1,476 @@
+import os
+import json
+import time
+import stat
+import uuid
+import shutil
+import hashlib
+import tempfile
+import threading
+import unicodedata
+from abc import ABC, abstractmethod
+from pathlib import Path
+from collections import OrderedDict
+
+from ml_editor.resources import get_artifact_signature
+
+
+def normalize_text(text):
+    """
+    Normalize a question before hashing it, so that questions which only
+    differ by their unicode representation or line endings share a key
+
+    Parameters
+    ----------
+    text : str
+        Input question
+
+    Returns
+    -------
+        Normalized text
+    """
+    text = unicodedata.normalize("NFC", text)
+    return text.replace("\r\n", "\n")
+
+
+def get_cache_key(text):
+    """
+    Hash a normalized question into a cache key
+
+    Parameters
+    ----------
+    text : str
+        Input question
+
+    Returns
+    -------
+        Hexadecimal digest
+    """
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+def get_artifact_fingerprint(paths):
+    """
+    Summarize the state of model artifacts as this process loaded them, to
+    detect when it runs different ones
+
+    Parameters
+    ----------
+    paths : list of Path
+        Artifacts a model is loaded from
+
+    Returns
+    -------
+        Short digest of the paths, modification times and sizes
+    """
+    digest = hashlib.sha1()
+    for path in paths:
+        digest.update(get_artifact_signature(path).encode())
+    return digest.hexdigest()[:12]
+
+
+def make_private_directory(directory):
+    """
+    Create a directory that only the current user can access, or check that
+    an existing one is. Cached results are read back from files, so a
+    directory other users can write to would let them plant results.
+
+    Parameters
+    ----------
+    directory : Path
+        Directory to create
+
+    Raises
+    ------
+    PermissionError
+        If the directory is a symlink, belongs to another user or can be
+        accessed by other users
+    """
+    directory.mkdir(mode=0o700, parents=True, exist_ok=True)
+    info = os.lstat(directory)
+    if not stat.S_ISDIR(info.st_mode):
+        raise PermissionError("{} is not a directory".format(directory))
+    if hasattr(os, "getuid") and info.st_uid != os.getuid():
+        raise PermissionError(
+            "{} belongs to another user".format(directory)
+        )
+    if info.st_mode & 0o077:
+        raise PermissionError(
+            "{} can be accessed by other users, restrict it to mode "
+            "0o700".format(directory)
+        )
+
+
+def get_hit_rate_stats(hits, misses):
+    """
+    Summarize hit and miss counters
+
+    Parameters
+    ----------
+    hits : int
+        Number of lookups that found a result
+    misses : int
+        Number of lookups that found nothing
+
+    Returns
+    -------
+        Dictionary of the counters and of the hit rate
+    """
+    total = hits + misses
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": hits / total if total else 0.0,
+    }
+
+
+class ResultCache(ABC):
+    """
+    Base class of size-bounded, TTL-aware caches of model results. Results
+    are stored in namespaces, one per model and version of its artifacts,
+    and looked up by the hash of the normalized question. Results are
+    stored as JSON, so they must be strings, numbers, lists or dicts.
+
+    Parameters
+    ----------
+    max_bytes : int, optional
+        Size of the serialized results above which the least recently used
+        ones are evicted, by default 64MB
+    ttl : float, optional
+        Seconds after which a result expires, by default None (never)
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, ttl=None):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._namespaces = {}
+        self._lock = threading.Lock()
+
+    def get_namespace(self, model, artifact_paths=()):
+        """
+        Name of the namespace holding a model's results. Artifacts are
+        fingerprinted as they were when loaded, so results are stored
+        under the artifacts that computed them even if the files were
+        replaced since. When a process loads new artifacts, results
+        computed with the previous ones are dropped.
+
+        Parameters
+        ----------
+        model : str
+            Name of the model
+        artifact_paths : list of Path, optional
+            Artifacts the model is loaded from, by default none
+        """
+        namespace = model
+        if artifact_paths:
+            fingerprint = get_artifact_fingerprint(artifact_paths)
+            namespace = "{}-{}".format(model, fingerprint)
+        if self._namespaces.get(model) != namespace:
+            self._namespaces[model] = namespace
+            self.invalidate(model, keep=namespace)
+        return namespace
+
+    def get(self, namespace, text, count=True):
+        """
+        Retrieve the result cached for a question
+
+        Parameters
+        ----------
+        namespace : str
+            Namespace returned by get_namespace
+        text : str
+            Input question
+        count : bool, optional
+            Whether the lookup counts towards the hit and miss counters,
+            by default True. Lookups polling for a result should not.
+
+        Returns
+        -------
+            The cached result, or None on a miss
+        """
+        return self.get_by_key(namespace, get_cache_key(text), count=count)
+
+    def get_by_key(self, namespace, key, count=True):
+        """
+        Retrieve a cached result from the key of its question, for requests
+        that refer to a question by its key instead of its text
+
+        Parameters
+        ----------
+        namespace : str
+            Namespace returned by get_namespace
+        key : str
+            Key returned by get_cache_key
+        count : bool, optional
+            Whether the lookup counts towards the hit and miss counters,
+            by default True
+
+        Returns
+        -------
+            The cached result, or None on a miss
+        """
+        value = self._get(namespace, key)
+        if count:
+            self._count(hit=value is not None)
+        return value
+
+    def set(self, namespace, text, value):
+        """
+        Cache the result for a question
+
+        Parameters
+        ----------
+        namespace : str
+            Namespace returned by get_namespace
+        text : str
+            Input question
+        value : object
+            JSON serializable result
+        """
+        self._set(namespace, get_cache_key(text), json.dumps(value))
+
+    def stats(self):
+        """
+        Hit and miss counters of this process, used to size the cache
+        """
+        with self._lock:
+            return get_hit_rate_stats(self.hits, self.misses)
+
+    @abstractmethod
+    def invalidate(self, model, keep=None):
+        """
+        Drop the namespaces of a model, except the one to keep
+        """
+
+    @abstractmethod
+    def _get(self, namespace, key):
+        """
+        Deserialized result stored under a key, or None
+        """
+
+    @abstractmethod
+    def _set(self, namespace, key, data):
+        """
+        Store a result serialized as JSON under a key
+        """
+
+    def _count(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def _is_expired(self, created):
+        return self.ttl is not None and time.time() - created > self.ttl
+
+
+class MemoryResultCache(ResultCache):
+    """
+    Result cache held in the memory of the current process. Each result
+    counts towards max_bytes for its serialized size plus ENTRY_OVERHEAD
+    bytes, an estimate of the memory held by its key, timestamp and slot
+    in the cache. Small results such as floats take about 400 bytes each,
+    measured with tracemalloc on CPython 3.11, of which about 20 are the
+    serialized float.
+    """
+
+    ENTRY_OVERHEAD = 400
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, ttl=None):
+        super().__init__(max_bytes=max_bytes, ttl=ttl)
+        self._entries = OrderedDict()
+        self._size = 0
+
+    def invalidate(self, model, keep=None):
+        with self._lock:
+            for namespace, key in list(self._entries):
+                if namespace != keep and namespace.split("-")[0] == model:
+                    self._remove((namespace, key))
+
+    def _get(self, namespace, key):
+        with self._lock:
+            entry = self._entries.get((namespace, key))
+            if entry is None:
+                return None
+            created, data = entry
+            if self._is_expired(created):
+                self._remove((namespace, key))
+                return None
+            self._entries.move_to_end((namespace, key))
+        return json.loads(data)
+
+    def _set(self, namespace, key, data):
+        with self._lock:
+            if (namespace, key) in self._entries:
+                self._remove((namespace, key))
+            self._entries[(namespace, key)] = (time.time(), data)
+            self._size += len(data) + self.ENTRY_OVERHEAD
+            while self._size > self.max_bytes and self._entries:
+                self._remove(next(iter(self._entries)))
+
+    def _remove(self, entry_key):
+        _, data = self._entries.pop(entry_key)
+        self._size -= len(data) + self.ENTRY_OVERHEAD
+
+
+class FileResultCache(ResultCache):
+    """
+    Result cache stored as JSON files in a local directory, shared by every
+    process using the same directory, such as gunicorn workers. The
+    directory must only be accessible to the current user, and is created
+    with mode 0o700. Files are written atomically, and the modification
+    time of a file records when its result was last used. Each process also writes its hit and miss
+    counters to the directory, at most every STATS_INTERVAL seconds, so
+    that stats covers every process which used the cache since the
+    directory was created. Remove its .stats directory to reset them.
+
+    Parameters
+    ----------
+    directory : str
+        Directory holding the cached results
+    max_bytes : int, optional
+        Total size of the files above which the least recently used ones
+        are evicted, by default 64MB
+    ttl : float, optional
+        Seconds after which a result expires, by default None (never)
+    """
+
+    STATS_INTERVAL = 1.0
+
+    def __init__(self, directory, max_bytes=64 * 1024 * 1024, ttl=None):
+        super().__init__(max_bytes=max_bytes, ttl=ttl)
+        self.directory = Path(directory)
+        make_private_directory(self.directory)
+        # Not a valid model name, so never dropped by invalidate
+        self._stats_directory = self.directory / ".stats"
+        self._stats_directory.mkdir(mode=0o700, exist_ok=True)
+        # Other processes also write to the directory, so this size is an
+        # estimate which is refreshed whenever we need to evict
+        self._size = self._get_entries_size()
+        self._stats_path = None
+        self._stats_pid = None
+        self._stats_written = 0.0
+
+    def stats(self):
+        """
+        Hit and miss counters summed over every process using the
+        directory, used to size the cache
+        """
+        with self._lock:
+            self._write_counters()
+        hits, misses = 0, 0
+        for path in self._stats_directory.glob("*.json"):
+            try:
+                with open(path) as f:
+                    counters = json.load(f)
+            except (OSError, ValueError):
+                continue
+            hits += counters["hits"]
+            misses += counters["misses"]
+        return get_hit_rate_stats(hits, misses)
+
+    def _count(self, hit):
+        with self._lock:
+            if self._stats_pid != os.getpid():
+                # Counters of a forked worker start from zero, the parent
+                # keeps reporting its own
+                self.hits, self.misses = 0, 0
+                self._stats_pid = os.getpid()
+                self._stats_path = self._stats_directory / "{}-{}.json".format(
+                    self._stats_pid, uuid.uuid4().hex[:8]
+                )
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+            if time.monotonic() - self._stats_written > self.STATS_INTERVAL:
+                self._write_counters()
+
+    def _write_counters(self):
+        """
+        Write the counters of this process, the lock must be held
+        """
+        if self._stats_path is None:
+            return
+        fd, tmp_path = tempfile.mkstemp(
+            dir=self._stats_directory, suffix=".tmp"
+        )
+        with os.fdopen(fd, "w") as f:
+            json.dump({"hits": self.hits, "misses": self.misses}, f)
+        os.replace(tmp_path, self._stats_path)
+        self._stats_written = time.monotonic()
+
+    def invalidate(self, model, keep=None):
+        for path in self.directory.iterdir():
+            namespace = path.name
+            if namespace != keep and namespace.split("-")[0] == model:
+                shutil.rmtree(path, ignore_errors=True)
+
+    def _get_path(self, namespace, key):
+        return self.directory / namespace / "{}.json".format(key)
+
+    def _get(self, namespace, key):
+        path = self._get_path(namespace, key)
+        try:
+            with open(path) as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if self._is_expired(entry["created"]):
+            self._remove(path)
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return entry["value"]
+
+    def _set(self, namespace, key, data):
+        path = self._get_path(namespace, key)
+        path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            # data is already serialized, so it is not parsed again
+            f.write(
+                '{{"created": {!r}, "value": {}}}'.format(time.time(), data)
+            )
+        os.replace(tmp_path, path)
+        self._size += os.path.getsize(path)
+        if self._size > self.max_bytes:
+            self._evict()
+
+    def _iter_entries(self):
+        for path in self.directory.glob("*/*.json"):
+            if path.parent == self._stats_directory:
+                continue
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            yield path, stat
+
+    def _get_entries_size(self):
+        return sum(stat.st_size for _, stat in self._iter_entries())
+
+    def _evict(self):
+        """
+        Remove the least recently used results until the cache is back
+        under 90% of its maximum size
+        """
+        entries = sorted(self._iter_entries(), key=lambda x: x[1].st_mtime)
+        size = sum(stat.st_size for _, stat in entries)
+        for path, stat in entries:
+            if size <= 0.9 * self.max_bytes:
+                break
+            self._remove(path)
+            size -= stat.st_size
+        self._size = size
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
@@ -0,0 +1,175 @@
+import os
+import sys
+from concurrent.futures import wait
+
+import numpy as np
+import pytest
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+# Needed for pytest to resolve imports properly
+myPath = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, myPath + '/../')
+
+import app as ml_app
+import ml_editor.model_v1 as v1_model
+import ml_editor.model_v3 as v3_model
+from ml_editor.jobs import BackgroundJobs
+from ml_editor.resources import LazyResource
+from ml_editor.result_cache import FileResultCache, get_cache_key
+
+QUESTIONS = [
+    "How do I write?",
+    "Why is my first paragraph so long and what can I do about it?",
+    "Any advice?",
+]
+
+
+class LengthModel:
+    """
+    Stand-in for the v1 model, whose positive probability grows with the
+    text_len feature, and which counts its calls
+    """
+
+    def __init__(self):
+        self.calls = 0
+
+    def predict_proba(self, features):
+        self.calls += 1
+        text_len = features.tocsr()[:, -2].toarray().ravel()
+        pos_proba = text_len / (text_len + 100)
+        return np.column_stack([1 - pos_proba, pos_proba])
+
+
+@pytest.fixture
+def client_and_model(monkeypatch):
+    model = LengthModel()
+    vectorizer = TfidfVectorizer().fit(QUESTIONS)
+    monkeypatch.setattr(v1_model, "MODEL", LazyResource(lambda: model))
+    monkeypatch.setattr(
+        v1_model, "VECTORIZER", LazyResource(lambda: vectorizer)
+    )
+    monkeypatch.setattr(
+        v1_model, "TRANSFORM_EXECUTOR", LazyResource(lambda: None)
+    )
+    return ml_app.app.test_client(), model
+
+
+@pytest.fixture
+def test_cache(monkeypatch, tmp_path):
+    cache = FileResultCache(tmp_path / "cache")
+    monkeypatch.setattr(ml_app, "RESULT_CACHE", cache)
+    monkeypatch.setattr(
+        ml_app, "JOB_STATE_NAMESPACE", cache.get_namespace("v3_jobs")
+    )
+    # Namespaces hash the model files, which tests do without
+    monkeypatch.setattr(
+        ml_app,
+        "get_cache_namespace",
+        lambda model, explanation=None: "test",
+    )
+    return cache
+
+
+@pytest.mark.parametrize(
+    "payload",
+    [None, {}, {"questions": "a question"}, {"questions": ["ok", 3]}],
+)
+def test_batch_rejects_malformed_payloads(client_and_model, payload):
+    client, model = client_and_model
+    response = client.post("/v1/batch", json=payload)
+    assert response.status_code == 400
+    assert model.calls == 0
+
+
+def test_batch_rejects_too_many_questions(client_and_model, monkeypatch):
+    client, model = client_and_model
+    monkeypatch.setattr(ml_app, "MAX_BATCH_SIZE", 2)
+    response = client.post("/v1/batch", json={"questions": QUESTIONS})
+    assert response.status_code == 413
+    assert model.calls == 0
+
+
+def test_batch_scores_questions_in_order(client_and_model):
+    client, model = client_and_model
+    response = client.post("/v1/batch", json={"questions": QUESTIONS})
+    assert response.status_code == 200
+    lengths = np.array([len(question) for question in QUESTIONS])
+    assert response.get_json()["model_name"] == "v1"
+    assert response.get_json()["scores"] == pytest.approx(
+        list(lengths / (lengths + 100))
+    )
+    assert model.calls == 1
+
+
+def test_empty_batch_does_not_call_model(client_and_model):
+    client, model = client_and_model
+    response = client.post("/v1/batch", json={"questions": []})
+    assert response.get_json()["scores"] == []
+    assert model.calls == 0
+
+
+@pytest.mark.parametrize("explanation", ["surrogate", "typo"])
+def test_v3_rejects_unavailable_explanation_modes(explanation, monkeypatch):
+    monkeypatch.setattr(
+        v3_model,
+        "explanation_table_path",
+        v3_model.explanation_table_path.with_name("missing_table.json"),
+    )
+    response = ml_app.app.test_client().post(
+        "/v3", data={"question": "A question?", "explanation": explanation}
+    )
+    assert response.status_code == 400
+
+
+def test_status_of_job_from_another_worker(test_cache, monkeypatch):
+    client = ml_app.app.test_client()
+    url = "/v3/explanations/fast/another-worker"
+    assert client.get(url).status_code == 404
+
+    # The job lives in another worker, which only shared its state
+    ml_app.set_job_state("fast", "another-worker", "pending")
+    response = client.get(url)
+    assert response.status_code == 202
+    assert response.get_json()["status"] == "pending"
+
+    monkeypatch.setattr(ml_app, "EXPLANATION_TIMEOUT", -1)
+    assert client.get(url).status_code == 404
+
+
+def test_failed_job_state_is_kept(test_cache, monkeypatch):
+    def fail(*args, **kwargs):
+        raise RuntimeError("Explanation failed")
+
+    jobs = BackgroundJobs(max_workers=1)
+    monkeypatch.setattr(ml_app, "EXPLANATION_JOBS", jobs)
+    monkeypatch.setattr(ml_app, "V3_SCORER", lambda question: (0.5, [0.0]))
+    monkeypatch.setattr(v3_model, "get_recommendations_from_features", fail)
+    client = ml_app.app.test_client()
+    client.post("/v3", data={"question": "A question?", "explanation": "fast"})
+    key = get_cache_key("A question?")
+    wait([jobs.get(("fast", key))], timeout=5)
+
+    # Another worker only sees the shared state
+    monkeypatch.setattr(ml_app, "EXPLANATION_JOBS", BackgroundJobs())
+    response = client.get("/v3/explanations/fast/{}".format(key))
+    assert response.status_code == 500
+    assert response.get_json()["status"] == "failed"
+
+
+def test_surrogate_explanations_are_served_inline(
+    test_cache, monkeypatch, tmp_path
+):
+    table_path = tmp_path / "explanation_table.json"
+    table_path.write_text("{}")
+    monkeypatch.setattr(v3_model, "explanation_table_path", table_path)
+    monkeypatch.setattr(
+        ml_app,
+        "retrieve_recommendations_for_model",
+        lambda question, model, explanation=None: "From the table",
+    )
+    response = ml_app.app.test_client().post(
+        "/v3", data={"question": "A question?", "explanation": "surrogate"}
+    )
+    assert response.status_code == 200
+    assert b"From the table" in response.data
+    assert b"EventSource" not in response.data
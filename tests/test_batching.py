@@ -0,0 +1,37 @@
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+# Needed for pytest to resolve imports properly
+myPath = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, myPath + '/../')
+
+from ml_editor.batching import RequestCoalescer
+
+
+def test_coalescer_returns_each_result_to_its_caller():
+    batch_sizes = []
+
+    def square_all(items):
+        batch_sizes.append(len(items))
+        return [item ** 2 for item in items]
+
+    coalescer = RequestCoalescer(square_all, max_batch_size=8, max_wait=0.05)
+    with ThreadPoolExecutor(max_workers=20) as executor:
+        results = list(executor.map(coalescer, range(20)))
+
+    assert results == [i ** 2 for i in range(20)]
+    assert sum(batch_sizes) == 20
+    assert max(batch_sizes) <= 8
+    assert len(batch_sizes) < 20
+
+
+def test_coalescer_propagates_errors():
+    def fail(items):
+        raise ValueError("bad batch")
+
+    coalescer = RequestCoalescer(fail)
+    with pytest.raises(ValueError):
+        coalescer(1)
@@ -0,0 +1,172 @@
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pytest
+from lime.lime_tabular import LimeTabularExplainer
+from sklearn.linear_model import LogisticRegression
+
+# Needed for pytest to resolve imports properly
+myPath = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, myPath + '/../')
+
+import ml_editor.explanation_generation as explanation_generation
+from ml_editor.batching import RequestCoalescer
+from ml_editor.explanation_generation import (
+    FEATURE_ARR,
+    build_explainer,
+    build_explanation_table,
+    explain_features,
+    explain_features_from_table,
+    get_explainer_stats,
+    get_seeded_explainer,
+    get_top_features,
+    load_explainer,
+    load_explanation_table,
+    parse_explanations,
+    predict_stacked,
+    save_explainer_stats,
+    save_explanation_table,
+)
+from ml_editor.resources import LazyResource
+
+
+@pytest.fixture
+def explainer_and_model():
+    random_state = np.random.RandomState(0)
+    data = random_state.gamma(2, 1, (500, 5))
+    labels = data[:, 0] - data[:, 1] > 0
+    model = LogisticRegression().fit(data, labels)
+    explainer = LimeTabularExplainer(
+        data,
+        feature_names=["a", "b", "c", "d", "e"],
+        class_names=["low", "high"],
+    )
+    return explainer, model, data[0]
+
+
+def test_seeded_explanations_are_reproducible(explainer_and_model):
+    explainer, model, row = explainer_and_model
+    explanations = [
+        get_seeded_explainer(explainer, 42)
+        .explain_instance(row, model.predict_proba, num_samples=200)
+        .as_list()
+        for _ in range(2)
+    ]
+    assert explanations[0] == explanations[1]
+
+
+def test_seeding_leaves_shared_explainer_untouched(explainer_and_model):
+    explainer, _, _ = explainer_and_model
+    random_state = explainer.random_state
+    seeded = get_seeded_explainer(explainer, 42)
+    assert seeded.random_state is not random_state
+    assert explainer.random_state is random_state
+    assert explainer.base.random_state is random_state
+    assert explainer.discretizer.random_state is random_state
+
+
+def test_explanation_table_round_trip(tmp_path):
+    random_state = np.random.RandomState(0)
+    data = pd.DataFrame(
+        random_state.gamma(2, 1, (500, len(FEATURE_ARR))), columns=FEATURE_ARR
+    )
+    labels = data["num_questions"] - data["num_periods"] > 0
+    model = LogisticRegression().fit(data.values, labels)
+
+    table = build_explanation_table(data, model.predict_proba, num_rows=100)
+    save_explanation_table(table, tmp_path / "table.json")
+    table = load_explanation_table(tmp_path / "table.json")
+
+    row = data.values[0].copy()
+    row[FEATURE_ARR.index("num_questions")] = 0
+    exp_list = explain_features_from_table(row, num_feats=5, table=table)
+    assert len(exp_list) == 5
+    assert exp_list[0][0].startswith("num_questions <= ")
+    assert exp_list[0][1] < 0
+    parsed_exps = parse_explanations(exp_list)
+    assert parsed_exps[0]["recommendation"] == "Increase"
+
+
+def test_explainer_rebuilt_from_stats_explains_identically(tmp_path):
+    random_state = np.random.RandomState(0)
+    data = pd.DataFrame(
+        random_state.gamma(2, 1, (500, len(FEATURE_ARR))), columns=FEATURE_ARR
+    )
+    # Repeated values give features fewer than four bins
+    data["num_exclam"] = random_state.choice([0, 0, 0, 1], len(data))
+    labels = data["num_questions"] - data["num_periods"] > 0
+    model = LogisticRegression().fit(data.values, labels)
+
+    explainer = build_explainer(data)
+    save_explainer_stats(get_explainer_stats(explainer), tmp_path / "s.json")
+    loaded = load_explainer(tmp_path / "s.json")
+
+    row = data.values[0]
+    explanations = [
+        get_seeded_explainer(exp, 42)
+        .explain_instance(row, model.predict_proba, num_samples=200)
+        .as_list()
+        for exp in [explainer, loaded]
+    ]
+    assert explanations[0] == explanations[1]
+
+
+def test_stacked_perturbations_explain_identically(explainer_and_model):
+    explainer, model, row = explainer_and_model
+    calls = []
+
+    def predict_proba(matrix):
+        calls.append(len(matrix))
+        return model.predict_proba(matrix)
+
+    scorer = RequestCoalescer(
+        lambda matrices: predict_stacked(predict_proba, matrices),
+        max_wait=0.05,
+    )
+
+    def explain(predict_fn):
+        return (
+            get_seeded_explainer(explainer, 42)
+            .explain_instance(row, predict_fn, num_samples=200)
+            .as_list()
+        )
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        stacked = list(executor.map(explain, [scorer] * 4))
+    assert stacked == [explain(model.predict_proba)] * 4
+    assert max(calls) > 200
+
+
+def test_adaptive_explanations_extend_perturbations(
+    explainer_and_model, monkeypatch
+):
+    explainer, model, row = explainer_and_model
+    monkeypatch.setattr(
+        explanation_generation, "EXPLAINER", LazyResource(lambda: explainer)
+    )
+    predicted = []
+
+    def predict_proba(matrix):
+        predicted.append(len(matrix))
+        return model.predict_proba(matrix)
+
+    exp = explain_features(
+        row,
+        predict_proba,
+        num_feats=5,
+        num_samples=4000,
+        min_samples=250,
+        top_k=2,
+        random_state=0,
+    )
+    full = explain_features(
+        row, model.predict_proba, num_feats=5, num_samples=4000, random_state=0
+    )
+    # Each budget only predicts the perturbations added to the previous one
+    doublings = [250 * 2 ** i for i in range(len(predicted) - 1)]
+    assert predicted == [250] + doublings
+    assert sum(predicted) < 4000
+    assert get_top_features(exp)[:2] == get_top_features(full)[:2]
@@ -1,14 +1,28 @@
 import os
 import sys
+import json
+import shutil
 
 from pathlib import Path
 import pandas as pd
+import pytest
+from bs4 import BeautifulSoup
 
 # Needed for pytest to resolve imports properly
 myPath = os.path.dirname(os.path.abspath(__file__))
 sys.path.insert(0, myPath + '/../')
 
-from ml_editor.data_ingestion import parse_xml_to_csv
+from ml_editor.data_ingestion import (
+    parse_xml_to_csv,
+    iter_posts_from_xml,
+    stream_xml_to_file,
+    iter_xml_rows,
+    get_text_from_html,
+    get_text_from_simple_html,
+    get_data_from_dump,
+    get_source_signature,
+    update_cache,
+)
 
 TEXT_LENGTH_FIELD = "text_len"
 
@@ -66,4 +80,164 @@ def test_text_mean():
     df = get_fixure_df()
     df['text_len'] = df['body_text'].str.len()
     text_col_mean = df['text_len'].mean()
-    assert text_col_mean in ACCEPTABLE_TEXT_LENGTH_MEANS
\ No newline at end of file
+    assert text_col_mean in ACCEPTABLE_TEXT_LENGTH_MEANS
+
+
+def test_streamed_chunks_match_parser():
+    """
+    Validate that streaming the dump in chunks gives the same posts as
+    parsing it at once
+    """
+    curr_path = Path(os.path.dirname(__file__))
+    chunks = list(
+        iter_posts_from_xml(curr_path / Path("fixtures/MiniPosts.xml"), 3)
+    )
+    assert [len(chunk) for chunk in chunks] == [3, 3, 2]
+
+    streamed = pd.concat(chunks)
+    df = get_fixure_df()
+    pd.testing.assert_frame_equal(
+        streamed[df.columns], df, check_dtype=False
+    )
+
+
+def test_stream_to_csv(tmp_path):
+    """
+    Validate that a dump streamed to csv can be read back
+    """
+    curr_path = Path(os.path.dirname(__file__))
+    save_path = tmp_path / "posts.csv"
+    num_rows = stream_xml_to_file(
+        curr_path / Path("fixtures/MiniPosts.xml"), save_path, chunk_size=3
+    )
+    df = pd.read_csv(save_path, index_col=0)
+    assert num_rows == len(df) == len(get_fixure_df())
+    assert list(df.index) == list(range(num_rows))
+    for col in REQUIRED_COLUMNS:
+        assert col in df.columns
+
+
+def test_parallel_decoding_matches_serial():
+    """
+    Validate that decoding across processes keeps texts and their order
+    """
+    curr_path = Path(os.path.dirname(__file__))
+    df = parse_xml_to_csv(
+        curr_path / Path("fixtures/MiniPosts.xml"), n_workers=2, chunksize=3
+    )
+    serial_df = get_fixure_df()
+    assert list(df["Id"]) == list(serial_df["Id"])
+    assert list(df["body_text"]) == list(serial_df["body_text"])
+
+
+def test_fast_decoder_matches_soup():
+    """
+    Validate that the fast html decoder handles the fixture bodies and
+    decodes them exactly like BeautifulSoup
+    """
+    curr_path = Path(os.path.dirname(__file__))
+    for row in iter_xml_rows(curr_path / Path("fixtures/MiniPosts.xml")):
+        soup = BeautifulSoup(row['Body'], features='html.parser')
+        assert get_text_from_simple_html(row['Body']) == soup.get_text()
+
+
+def test_fast_decoder_falls_back_to_soup():
+    """
+    Validate that markup the fast decoder does not handle is left to
+    BeautifulSoup
+    """
+    for html in ["<!-- a -->b", "<script>a</script>b", "a &foo; b", "a < b"]:
+        assert get_text_from_simple_html(html) is None
+        soup = BeautifulSoup(html, features='html.parser')
+        assert get_text_from_html(html) == soup.get_text()
+
+
+@pytest.fixture
+def dump_dir(tmp_path):
+    """Copy the fixture dump where get_data_from_dump expects a site dump
+    """
+    curr_path = Path(os.path.dirname(__file__))
+    site_path = tmp_path / "mini.stackexchange.com"
+    site_path.mkdir()
+    shutil.copy(curr_path / Path("fixtures/MiniPosts.xml"), site_path)
+    os.rename(site_path / "MiniPosts.xml", site_path / "Posts.xml")
+    return tmp_path
+
+
+@pytest.mark.parametrize("cache_format", ["parquet", "feather"])
+def test_columnar_cache_is_typed(dump_dir, cache_format):
+    """
+    Validate that cached extracts keep integer types and can be projected
+    """
+    pytest.importorskip("pyarrow")
+    df = get_data_from_dump(
+        "mini", data_path=dump_dir, cache_format=cache_format
+    )
+    assert len(df) == len(get_fixure_df())
+    for col in ["Id", "PostTypeId", "AnswerCount", "OwnerUserId"]:
+        assert df[col].dtype == "Int64"
+
+    df = get_data_from_dump(
+        "mini",
+        data_path=dump_dir,
+        columns=["Id", "body_text"],
+        cache_format=cache_format,
+    )
+    assert list(df.columns) == ["Id", "body_text"]
+
+
+def test_columnar_cache_invalidated_on_change(dump_dir):
+    """
+    Validate that the cache is rebuilt when the dump changes
+    """
+    pytest.importorskip("pyarrow")
+    dump_path = dump_dir / "mini.stackexchange.com" / "Posts.xml"
+    metadata_path = dump_dir / "mini.parquet.json"
+    get_data_from_dump("mini", data_path=dump_dir)
+
+    with open(dump_path, "a") as f:
+        f.write("\n")
+    get_data_from_dump("mini", data_path=dump_dir)
+    with open(metadata_path) as f:
+        assert json.load(f)["source"] == get_source_signature(dump_path)
+
+
+@pytest.mark.parametrize("cache_format", ["parquet", "feather"])
+def test_incremental_update_matches_full_build(dump_dir, cache_format):
+    """
+    Validate that only new and changed posts are decoded when refreshing an
+    extract, and that merging them chunk by chunk matches a full rebuild
+    """
+    pytest.importorskip("pyarrow")
+    dump_path = dump_dir / "mini.stackexchange.com" / "Posts.xml"
+    with open(dump_path) as f:
+        lines = f.read().splitlines()
+    header, rows, footer = lines[:2], lines[2:-1], lines[-1:]
+
+    # Build a first extract from the oldest posts only
+    with open(dump_path, "w") as f:
+        f.write("\n".join(header + rows[:5] + footer))
+    get_data_from_dump("mini", data_path=dump_dir, cache_format=cache_format)
+
+    # Add the newest posts, and update the activity date of an old one
+    rows[1] = rows[1].replace(
+        'LastActivityDate="2010-09-28T23:41:06.263"',
+        'LastActivityDate="2019-01-01T00:00:00.000"',
+    )
+    with open(dump_path, "w") as f:
+        f.write("\n".join(header + rows + footer))
+    extracted_path = dump_dir / "mini.{}".format(cache_format)
+    assert update_cache(
+        dump_path, extracted_path, cache_format, chunk_size=2
+    ) == 4
+
+    updated = get_data_from_dump(
+        "mini", data_path=dump_dir, cache_format=cache_format
+    )
+    rebuilt = get_data_from_dump(
+        "mini",
+        data_path=dump_dir,
+        cache_format=cache_format,
+        load_existing=False,
+    )
+    pd.testing.assert_frame_equal(updated, rebuilt)
@@ -0,0 +1,67 @@
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+# Needed for pytest to resolve imports properly
+myPath = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, myPath + '/../')
+
+from ml_editor.jobs import BackgroundJobs, JobQueueFull
+
+
+def test_jobs_are_refused_when_queue_is_full():
+    release = threading.Event()
+    jobs = BackgroundJobs(max_workers=1, max_pending=2)
+    first = jobs.submit("first", release.wait)
+    jobs.submit("second", release.wait)
+    with pytest.raises(JobQueueFull):
+        jobs.submit("third", release.wait)
+
+    # A pending job with the same id is reused instead of counted twice
+    assert jobs.submit("first", release.wait) is first
+    release.set()
+    first.result(timeout=5)
+    assert jobs.get("first") is first
+
+
+def test_waiting_jobs_can_be_cancelled():
+    release = threading.Event()
+    jobs = BackgroundJobs(max_workers=1)
+    running = jobs.submit("running", release.wait)
+    waiting = jobs.submit("waiting", release.wait)
+
+    assert jobs.release("waiting")
+    assert waiting.cancelled()
+    assert jobs.get("waiting") is None
+    assert jobs.num_pending() == 1
+    release.set()
+    assert running.result(timeout=5)
+    assert not jobs.release("running")
+
+
+def test_shared_jobs_are_cancelled_by_last_subscriber():
+    release = threading.Event()
+    jobs = BackgroundJobs(max_workers=1)
+    running = jobs.submit("running", release.wait)
+    waiting = jobs.submit("waiting", release.wait)
+    assert jobs.submit("waiting", release.wait) is waiting
+
+    assert not jobs.release("waiting")
+    assert not waiting.cancelled()
+    assert jobs.release("waiting")
+    assert waiting.cancelled()
+    release.set()
+    assert running.result(timeout=5)
+
+
+def test_finished_jobs_expire():
+    jobs = BackgroundJobs(ttl=0)
+    jobs.submit("job", int).result(timeout=5)
+    # The job is marked finished by a callback running after result returns
+    deadline = time.monotonic() + 5
+    while jobs.get("job") is not None and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert jobs.get("job") is None
@@ -1,4 +1,5 @@
 import os
+import re
 import sys
 from pathlib import Path
 import pandas as pd 
@@ -14,6 +15,10 @@ from ml_editor.data_processing import (
     get_feature_vector_and_label,
 )
 from ml_editor.model_v1 import get_model_predictions_for_input_texts
+import ml_editor.model_v2 as v2_model
+from ml_editor.model_v2 import CHAR_COUNT_FEATURES, add_char_count_features
+from ml_editor.resources import LazyResource
+from ml_editor.result_cache import MemoryResultCache
 
 myPath = os.path.dirname(os.path.abspath(__file__))
 sys.path.insert(0, myPath+'/../')
@@ -95,4 +100,64 @@ def test_model_predicts_no_on_bad_question():
     input_text = "This isn't even a question. We should score it poorly"
     is_question_good = get_model_predictions_for_input_texts([input_text])
     # The model classifies the question as poor
-    assert not is_question_good[0]
\ No newline at end of file
+    assert not is_question_good[0]
+
+
+def test_char_counts_match_regex_counts():
+    texts = pd.Series(
+        ["What? No. Yes, \"maybe\": no; ok!", "", "Ünïcödé… ¿qué? ; :", None]
+    )
+    df = add_char_count_features(pd.DataFrame({"full_text": texts}))
+    for feature_name, char in CHAR_COUNT_FEATURES.items():
+        expected = 100 * texts.str.count(re.escape(char)) / texts.str.len()
+        pd.testing.assert_series_equal(
+            df[feature_name], expected, check_names=False
+        )
+
+
+class LengthSentimentAnalyzer:
+    """
+    Stand-in for VADER, whose positive score depends on the text
+    """
+
+    def polarity_scores(self, text):
+        return {"pos": len(set(text)) / (len(text) + 1)}
+
+
+def test_batched_word_stats_match_serial(df_with_features, monkeypatch):
+    spacy = pytest.importorskip("spacy")
+    # A blank pipeline has no tagger, but tokenizes and flags stop words
+    # like the real model, which is enough to compare batching settings
+    nlp = spacy.blank("en")
+    monkeypatch.setattr(v2_model, "SPACY_MODEL", LazyResource(lambda: nlp))
+    df = add_char_count_features(df_with_features[["full_text"]].copy())
+
+    serial = v2_model.get_word_stats(df.copy(), batch_size=64, n_process=1)
+    for batch_size, n_process in [(1, 1), (3, 2)]:
+        batched = v2_model.get_word_stats(
+            df.copy(), batch_size=batch_size, n_process=n_process
+        )
+        pd.testing.assert_frame_equal(batched, serial)
+
+
+def test_parallel_polarity_scores_match_serial(monkeypatch):
+    monkeypatch.setattr(
+        v2_model,
+        "SENTIMENT_ANALYZER",
+        LazyResource(LengthSentimentAnalyzer),
+    )
+    texts = ["Question number {}?".format(i) * i for i in range(20)]
+
+    results = []
+    for n_process in [1, 2]:
+        monkeypatch.setattr(v2_model, "POLARITY_CACHE", MemoryResultCache())
+        results.append(
+            v2_model.get_polarity_scores(
+                texts, n_process=n_process, chunksize=3
+            )
+        )
+    assert results[0] == results[1]
+    assert results[0] == [
+        LengthSentimentAnalyzer().polarity_scores(text)["pos"]
+        for text in texts
+    ]
@@ -2,9 +2,16 @@ import os
 import sys
 
 from pathlib import Path
+import numpy as np
 import pandas as pd
 
 import pytest
+from scipy.sparse import issparse
+from sklearn.feature_extraction.text import (
+    HashingVectorizer,
+    TfidfTransformer,
+    TfidfVectorizer,
+)
 
 # Needed for pytest to resolve imports properly
 myPath = os.path.dirname(os.path.abspath(__file__))
@@ -15,8 +22,17 @@ from ml_editor.data_processing import (
     get_random_train_test_split,
     get_split_by_author,
     add_text_features_to_df,
-    format_raw_df
+    format_raw_df,
+    get_feature_vector_and_label,
+    get_vectorized_inputs_and_label,
+    get_vectorized_series,
+    get_normalized_series,
+    get_transform_executor,
+    transform_in_parallel,
+    V1_KEYWORD_FEATURES,
 )
+from ml_editor.feature_store import FeatureStore
+from ml_editor.hashing_vectorizer import StreamingTfidfVectorizer
 
 REQUIRED_FEATURES = [
     'is_question',
@@ -68,4 +84,88 @@ def test_text_length(df_with_features):
     text_min = df_with_features["text_len"].min()
     assert text_mean in pd.Interval(left=200, right=1000)
     assert text_max in pd.Interval(left=0, right=10000)
-    assert text_min in pd.Interval(left=0, right=1000)
\ No newline at end of file
+    assert text_min in pd.Interval(left=0, right=1000)
+
+
+def test_keyword_features_match_contains(df_with_features):
+    for feature_name, keywords in V1_KEYWORD_FEATURES.items():
+        expected = df_with_features["full_text"].apply(
+            lambda text: any(keyword in text for keyword in keywords)
+        )
+        assert (df_with_features[feature_name] == expected).all()
+
+
+def test_feature_store_matches_vectorized_series(df_with_features):
+    df = df_with_features[df_with_features["is_question"]]
+    vectorizer = TfidfVectorizer().fit(df["full_text"])
+    store = FeatureStore.from_texts(df["full_text"], vectorizer)
+    train_df, test_df = get_split_by_author(df, test_size=0.5)
+    for split_df in [train_df, test_df]:
+        split_df = split_df.copy()
+        split_df["vectors"] = get_vectorized_series(
+            split_df["full_text"], vectorizer
+        )
+        from_series, labels = get_feature_vector_and_label(
+            split_df, ["text_len"]
+        )
+        from_store, store_labels = get_feature_vector_and_label(
+            split_df, ["text_len"], store=store
+        )
+        assert (from_series != from_store).nnz == 0
+        assert labels.equals(store_labels)
+
+
+def test_feature_store_rejects_unknown_rows(df_with_features):
+    df = df_with_features[df_with_features["is_question"]]
+    vectorizer = TfidfVectorizer().fit(df["full_text"])
+    store = FeatureStore.from_texts(df["full_text"], vectorizer)
+    with pytest.raises(KeyError):
+        store.get_rows([-1])
+
+
+def test_vectorized_inputs_stay_sparse(df_with_features):
+    df = df_with_features[df_with_features["is_question"]].copy()
+    df["norm_text_len"] = get_normalized_series(df, "text_len")
+    vectorizer = TfidfVectorizer().fit(df["full_text"])
+    store = FeatureStore.from_texts(df["full_text"], vectorizer)
+    features, labels = get_vectorized_inputs_and_label(
+        df, store=store, dtype=np.float32
+    )
+    assert issparse(features)
+    assert features.dtype == np.float32
+    assert features.shape == (len(df), len(vectorizer.vocabulary_) + 4)
+    assert len(labels) == len(df)
+
+
+def test_streaming_tfidf_matches_tfidf_transformer(df_with_features):
+    texts = df_with_features["full_text"]
+    chunks = [texts[i:i + 10] for i in range(0, len(texts), 10)]
+    vectorizer = StreamingTfidfVectorizer(
+        n_features=2 ** 12, min_df=1, max_df=1.0
+    )
+    vectorizer.fit(chunks)
+
+    hasher = HashingVectorizer(
+        n_features=2 ** 12,
+        strip_accents="ascii",
+        alternate_sign=False,
+        norm=None,
+    )
+    counts = hasher.transform(texts)
+    expected = TfidfTransformer().fit(counts).transform(counts)
+    vectors = vectorizer.transform(texts)
+    assert np.allclose(vectors.toarray(), expected.toarray())
+
+
+def test_parallel_transform_is_identical(df_with_features):
+    texts = df_with_features["full_text"].tolist()
+    vectorizer = TfidfVectorizer().fit(texts)
+    expected = vectorizer.transform(texts)
+    with get_transform_executor(vectorizer, n_workers=2) as executor:
+        vectors = transform_in_parallel(
+            vectorizer, texts, executor=executor, chunk_size=7
+        )
+    assert vectors.dtype == expected.dtype
+    assert np.array_equal(vectors.indptr, expected.indptr)
+    assert np.array_equal(vectors.indices, expected.indices)
+    assert np.array_equal(vectors.data, expected.data)
@@ -0,0 +1,161 @@
+import os
+import sys
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import joblib
+import pytest
+
+# Needed for pytest to resolve imports properly
+myPath = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, myPath + '/../')
+
+from ml_editor.resources import load_artifact
+from ml_editor.result_cache import (
+    MemoryResultCache,
+    FileResultCache,
+    ResultCache,
+)
+
+
+@pytest.fixture(params=["memory", "file"])
+def make_cache(request, tmp_path):
+    def make(**kwargs):
+        if request.param == "memory":
+            return MemoryResultCache(**kwargs)
+        return FileResultCache(tmp_path / "cache", **kwargs)
+    return make
+
+
+def test_cache_hits_and_misses(make_cache):
+    cache = make_cache()
+    namespace = cache.get_namespace("v2")
+    assert cache.get(namespace, "A question?") is None
+    cache.set(namespace, "A question?", "result")
+    assert cache.get(namespace, "A question?") == "result"
+    # Line endings are normalized before hashing
+    cache.set(namespace, "Two\r\nlines", "other result")
+    assert cache.get(namespace, "Two\nlines") == "other result"
+    assert cache.stats()["hits"] == 2
+    assert cache.stats()["misses"] == 1
+
+
+def test_cache_expires_results(make_cache):
+    cache = make_cache(ttl=0.05)
+    namespace = cache.get_namespace("v2")
+    cache.set(namespace, "A question?", "result")
+    time.sleep(0.1)
+    assert cache.get(namespace, "A question?") is None
+
+
+def test_cache_evicts_least_recently_used(make_cache):
+    cache = make_cache(max_bytes=2000)
+    namespace = cache.get_namespace("v2")
+    for i in range(20):
+        cache.set(namespace, "question {}".format(i), "x" * 200)
+        time.sleep(0.01)
+    assert cache.get(namespace, "question 0") is None
+    assert cache.get(namespace, "question 19") == "x" * 200
+
+
+def test_cache_invalidated_when_artifacts_change(make_cache, tmp_path):
+    cache = make_cache()
+    artifact = tmp_path / "model.pkl"
+    artifact.write_bytes(b"model")
+    namespace = cache.get_namespace("v2", [artifact])
+    cache.set(namespace, "A question?", "result")
+    assert cache.get_namespace("v2", [artifact]) == namespace
+
+    artifact.write_bytes(b"retrained model")
+    new_namespace = cache.get_namespace("v2", [artifact])
+    assert new_namespace != namespace
+    assert cache.get(new_namespace, "A question?") is None
+    assert cache.get(namespace, "A question?") is None
+
+
+def test_namespace_follows_loaded_artifacts(tmp_path):
+    cache = MemoryResultCache()
+    artifact = tmp_path / "model.pkl"
+    joblib.dump({"weights": [1]}, artifact)
+    load_artifact(artifact)
+    namespace = cache.get_namespace("v2", [artifact])
+
+    # The loaded model keeps computing results until it is reloaded
+    joblib.dump({"weights": [1, 2, 3]}, artifact)
+    assert cache.get_namespace("v2", [artifact]) == namespace
+    load_artifact(artifact)
+    assert cache.get_namespace("v2", [artifact]) != namespace
+
+
+def test_file_cache_shared_between_instances(tmp_path):
+    writer = FileResultCache(tmp_path / "cache")
+    reader = FileResultCache(tmp_path / "cache")
+    writer.set(writer.get_namespace("v3"), "A question?", "result")
+    assert reader.get(reader.get_namespace("v3"), "A question?") == "result"
+
+
+def test_file_cache_refuses_shared_directory(tmp_path):
+    directory = tmp_path / "cache"
+    directory.mkdir()
+    directory.chmod(0o777)
+    with pytest.raises(PermissionError):
+        FileResultCache(directory)
+
+
+def test_file_cache_stores_json(tmp_path):
+    cache = FileResultCache(tmp_path / "cache")
+    assert (tmp_path / "cache").stat().st_mode & 0o777 == 0o700
+    namespace = cache.get_namespace("v3")
+    cache.set(namespace, "A question?", {"status": "pending"})
+    path, = (tmp_path / "cache" / namespace).iterdir()
+    assert json.loads(path.read_text())["value"] == {"status": "pending"}
+
+    # Files which are not JSON are misses rather than being loaded
+    path.write_bytes(b"\x80\x04K\x01.")
+    assert cache.get(namespace, "A question?") is None
+
+
+def test_result_cache_is_abstract():
+    with pytest.raises(TypeError):
+        ResultCache()
+
+
+def test_cache_counts_concurrent_lookups(make_cache):
+    cache = make_cache()
+    namespace = cache.get_namespace("v2")
+    cache.set(namespace, "A question?", "result")
+
+    def look_up(i):
+        for _ in range(200):
+            cache.get(namespace, "A question?" if i % 2 else "Unknown")
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(look_up, range(8)))
+    assert cache.stats()["hits"] == 800
+    assert cache.stats()["misses"] == 800
+
+
+def test_file_cache_stats_cover_every_process(tmp_path):
+    worker_a = FileResultCache(tmp_path / "cache")
+    worker_b = FileResultCache(tmp_path / "cache")
+    # Write the counters after every lookup instead of every second
+    worker_a.STATS_INTERVAL = worker_b.STATS_INTERVAL = 0
+    namespace = worker_a.get_namespace("v2")
+    worker_a.set(namespace, "A question?", "result")
+    assert worker_a.get(namespace, "Unknown") is None
+    assert worker_b.get(namespace, "A question?") == "result"
+    assert worker_b.get(namespace, "A question?") == "result"
+
+    for cache in [worker_a, worker_b]:
+        assert cache.stats()["hits"] == 2
+        assert cache.stats()["misses"] == 1
+
+
+def test_memory_cache_counts_entry_overhead():
+    cache = MemoryResultCache(max_bytes=10 * MemoryResultCache.ENTRY_OVERHEAD)
+    namespace = cache.get_namespace("polarity")
+    for i in range(100):
+        cache.set(namespace, "question {}".format(i), 0.5)
+    kept = [cache.get(namespace, "question {}".format(i)) for i in range(100)]
+    assert 0 < sum(score is not None for score in kept) < 10